@@ -2,6 +2,8 @@
 # but different letters.
 
 class ArcSet(object):
+    __slots__ = ('source', 'dest', 'letters', 'weight')
+
     def __init__(self, source, dest, letters, weight):
         self.source = source
         self.dest = dest
@@ -17,7 +19,15 @@ class ArcSet(object):
     def __len__(self):
         return len(self.letters)
 
+    def __getstate__(self):
+        return _slot_state(self)
+
+    def __setstate__(self, state):
+        _set_slot_state(self, state)
+
 class NatClassArcSet(ArcSet):
+    __slots__ = ('labels',)
+
     def __init__(self, source, dest, letters, weight, nat_class_set):
         self.source = source
         self.dest = dest
@@ -27,6 +37,20 @@ class NatClassArcSet(ArcSet):
              nat_class_set.classes)
 
 
+def _slot_state(obj):
+    '''The dict of the slots set on obj, for pickling classes that have
+    __slots__ and so no __dict__.'''
+    state = {}
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    return state
+
+def _set_slot_state(obj, state):
+    for name, value in state.iteritems():
+        setattr(obj, name, value)
+
 def _get_covering_labels( letters, classes ):
     ''' 
     >>> from nat_class_set import NaturalClassSet
@@ -0,0 +1,178 @@
+import string
+from math import log
+import numpy
+from fsa.wfsa import MultWFSA, LogWFSA
+from fsa.param_wfsa import ParametrizedWFSA, parametrized_states
+from fsa.arc_set import ArcSet
+from fsa.nat_class_set import NaturalClassSet
+
+'''Random machines, corpora and natural class systems to benchmark with. Every
+generator draws from the numpy.random.RandomState it is given, so a run can be
+repeated exactly from its seed.'''
+
+LETTERS = string.ascii_lowercase + string.ascii_uppercase + string.digits
+
+def alphabet( size ):
+	'''The first size single character letters.'''
+	if size > len(LETTERS):
+		raise ValueError('No more than ' + str(len(LETTERS)) + ' letters.')
+	return list(LETTERS[:size])
+
+def random_arcs( num_states, alphabet_size, density = 0.5, other = False,
+		rng = None ):
+	'''
+	A random deterministic machine in the form MultWFSA takes: returns
+	(alphabet, stops, arcs), with states named 0 to num_states-1 and 0 the
+	start state. Each state has an arc on each letter with probability density
+	to a random state, and state i always has one to state i+1, so trimming
+	keeps every state. If other is true each state also sends the letters it
+	has no explicit arc for along an '_other' arc. The weights of each state
+	are locally normalized: its stop weight and arc weights, counting an
+	'_other' arc once for every letter it covers, sum to one.
+	'''
+	if rng is None:
+		rng = numpy.random.RandomState()
+	letters = alphabet(alphabet_size)
+	stops = {}
+	arcs = {}
+	for state in range(num_states):
+		present = rng.random_sample(alphabet_size) < density
+		chain = rng.randint(alphabet_size)
+		present[chain] = True
+		dests = rng.randint(num_states, size=alphabet_size)
+		if state + 1 < num_states:
+			dests[chain] = state + 1
+		explicit = numpy.flatnonzero(present)
+		uncovered = alphabet_size - len(explicit)
+		has_other = other and uncovered > 0
+		shares = rng.dirichlet(numpy.ones(len(explicit) + 1 + has_other))
+		stops[state] = shares[0]
+		arcs[state] = dict([(letters[i], (int(dests[i]), shares[j+1]))
+			for j, i in enumerate(explicit)])
+		if has_other:
+			arcs[state]['_other'] = (int(rng.randint(num_states)),
+				shares[-1]/uncovered)
+	return letters, stops, arcs
+
+def random_untrimmed_arcs( num_states, alphabet_size, density = 0.5,
+		other = False, rng = None ):
+	'''
+	As random_arcs, but only half of the num_states states are on a path from
+	the start state to a stop. A quarter can't be reached from the start
+	state: they have stops and arcs into the live states, but no arcs lead to
+	them. The rest are reachable but dead: most live states have an arc into
+	them, they only have arcs among themselves and none of them stops. These
+	are the states trim removes.
+	'''
+	if rng is None:
+		rng = numpy.random.RandomState()
+	live = (num_states + 1)//2
+	unreachable = (num_states - live)//2
+	dead = num_states - live - unreachable
+	letters, stops, arcs = random_arcs(live, alphabet_size, density, other,
+		rng)
+	#the other states, drawn as in random_arcs and then pointed at the
+	#states each may reach
+	letters, waste_stops, waste = random_arcs(unreachable + dead,
+		alphabet_size, density, other, rng)
+	for i in range(unreachable + dead):
+		if i < unreachable:
+			stops[live + i] = waste_stops[i]
+			first, count = 0, live
+		else:
+			first, count = live + unreachable, dead
+		arcs[live + i] = dict([(letter, (first + dest % count, weight))
+			for letter, (dest, weight) in waste[i].iteritems()])
+	#one arc of each live state, off the chain that keeps the live states
+	#reachable, goes to a dead state instead
+	for state in range(live):
+		letters_off_chain = sorted([x for x in arcs[state] if x != '_other'
+			and arcs[state][x][0] != state + 1])
+		if dead and letters_off_chain:
+			letter = letters_off_chain[0]
+			arcs[state][letter] = (live + unreachable + int(rng.randint(dead)),
+				arcs[state][letter][1])
+	return letters, stops, arcs
+
+def log_weights( stops, arcs, base = 2 ):
+	'''The stops and arcs of random_arcs with each weight p replaced by
+	-log(p), for building a LogWFSA.'''
+	log_stops = dict([(x, -log(stops[x], base)) for x in stops])
+	log_arcs = {}
+	for source in arcs:
+		log_arcs[source] = dict([(letter, (dest, -log(weight, base)))
+			for letter, (dest, weight) in arcs[source].iteritems()])
+	return log_stops, log_arcs
+
+def random_mult_wfsa( num_states, alphabet_size, density = 0.5, other = False,
+		rng = None ):
+	letters, stops, arcs = random_arcs(num_states, alphabet_size, density,
+		other, rng)
+	return MultWFSA(letters, 0, stops, arcs)
+
+def random_log_wfsa( num_states, alphabet_size, density = 0.5, other = False,
+		rng = None ):
+	letters, stops, arcs = random_arcs(num_states, alphabet_size, density,
+		other, rng)
+	stops, arcs = log_weights(stops, arcs)
+	return LogWFSA(letters, 0, stops, arcs)
+
+def random_tied_arcsets( num_states, alphabet_size, num_params,
+		density = 0.5, other = False, rng = None ):
+	'''
+	A random machine in the form parametrized_states takes: returns
+	(alphabet, arcsets, stops, parameters). The topology is drawn as in
+	random_arcs; the letters of a state going to the same destination share an
+	ArcSet, and each ArcSet and stop is tied to a random one of num_params
+	parameters, or to the default weight one time in num_params+1.
+	'''
+	if rng is None:
+		rng = numpy.random.RandomState()
+	letters, stops, arcs = random_arcs(num_states, alphabet_size, density,
+		other, rng)
+	arcsets = []
+	tied_stops = {}
+	for source in arcs:
+		by_dest = {}
+		for letter, (dest, weight) in arcs[source].iteritems():
+			by_dest.setdefault(dest, []).append(letter)
+		for dest, dest_letters in by_dest.iteritems():
+			arcsets.append(ArcSet(source, dest, dest_letters,
+				int(rng.randint(-1, num_params))))
+		tied_stops[source] = int(rng.randint(-1, num_params))
+	parameters = list(rng.exponential(2.0, num_params))
+	return letters, arcsets, tied_stops, parameters
+
+def random_param_wfsa( num_states, alphabet_size, num_params, density = 0.5,
+		other = False, rng = None ):
+	letters, arcsets, stops, parameters = random_tied_arcsets(num_states,
+		alphabet_size, num_params, density, other, rng)
+	states = parametrized_states(letters, arcsets, stops, parameters)
+	return ParametrizedWFSA(letters, 0, states, parameters)
+
+def random_corpus( mult_wfsa, size, rng = None ):
+	'''size words drawn from the distribution mult_wfsa defines, so that every
+	word has a path through machines with its topology.'''
+	return mult_wfsa.sample(size, rng)
+
+def random_classes( letters, num_features, rng = None ):
+	'''
+	The classes of a random binary feature system over letters: each of
+	num_features features splits the letters into a random non-empty proper
+	subset and its complement. NaturalClassSet closes them under intersection.
+	'''
+	if rng is None:
+		rng = numpy.random.RandomState()
+	classes = set([])
+	for feature in range(num_features):
+		plus = rng.random_sample(len(letters)) < 0.5
+		inside, outside = rng.permutation(len(letters))[:2]
+		plus[inside] = True
+		plus[outside] = False
+		classes.add(frozenset([x for x, y in zip(letters, plus) if y]))
+		classes.add(frozenset([x for x, y in zip(letters, plus) if not y]))
+	return classes
+
+def random_nat_class_set( alphabet_size, num_features, rng = None ):
+	letters = alphabet(alphabet_size)
+	return NaturalClassSet(letters, random_classes(letters, num_features, rng))
@@ -0,0 +1,313 @@
+import sys
+import json
+import resource
+import timeit
+import argparse
+from math import log
+import numpy
+from fsa.wfsa import LogWFSA
+from fsa.nat_class_set import NaturalClassSet
+from fsa.benchmarks.micro import environment, compare
+
+'''An end to end run shaped like our phonotactic learning: a synthetic lexicon
+of CV syllables over a feature system, the natural classes of the features,
+bigram, vowel mutual information and stress machines estimated from the
+lexicon, their intersection, and the corpus cost objective evaluated along a
+trajectory of parameter settings. Reports the wall time and peak memory of
+every stage as JSON:
+
+	python -m fsa.benchmarks.macro --output before.json
+	python -m fsa.benchmarks.macro --compare before.json --tolerance 1.1
+
+With --tolerance the run fails if it is slower than the baseline by more than
+that factor, so it can serve as the acceptance check for performance work.
+
+The machines are laid out as bigram_plog_wfsa, v_mi_wfsa and
+bigram_stress_wfsa in wfsa_generator lay them out, and the objective follows
+BoltzmannMinimizer.objective in gradientfsa.'''
+
+CONSONANTS = 'ptkbdgmnszlr'
+#lower case vowels are unstressed, upper case ones stressed
+VOWELS = 'aeiouAEIOU'
+ALPHABET = CONSONANTS + VOWELS
+BOUNDARY = '#'
+
+def features():
+	'''The classes picked out by the + value of each binary feature of
+	ALPHABET.'''
+	plus = {
+		'consonantal':CONSONANTS,
+		'voice':'bdgmnzlr' + VOWELS,
+		'sonorant':'mnlr' + VOWELS,
+		'nasal':'mn',
+		'continuant':'szlr' + VOWELS,
+		'labial':'pbm',
+		'coronal':'tdnszlr',
+		'dorsal':'kg',
+		'high':'iuIU',
+		'low':'aA',
+		'back':'ouaOUA',
+		'round':'ouOU',
+		'stress':'AEIOU',
+	}
+	classes = set([])
+	for letters in plus.itervalues():
+		classes.add(frozenset(letters))
+		classes.add(frozenset(ALPHABET).difference(letters))
+	return classes
+
+def stress( vowel ):
+	return 'S' if vowel.isupper() else 'U'
+
+def lexicon( num_words, rng ):
+	'''num_words words of one to four CV syllables, each with an optional coda
+	and exactly one stressed vowel. Letters are drawn with Zipfian
+	frequencies.'''
+	def zipf( letters ):
+		weights = 1.0/numpy.arange(1, len(letters) + 1)
+		return list(letters), weights/weights.sum()
+	consonants, consonant_p = zipf(CONSONANTS)
+	vowels, vowel_p = zipf(VOWELS[:5])
+	words = []
+	for i in range(num_words):
+		syllables = rng.randint(1, 5)
+		stressed = rng.randint(syllables)
+		word = []
+		for syllable in range(syllables):
+			word.append(rng.choice(consonants, p=consonant_p))
+			vowel = rng.choice(vowels, p=vowel_p)
+			word.append(vowel.upper() if syllable == stressed else vowel)
+			if rng.random_sample() < 0.2:
+				word.append(rng.choice(consonants, p=consonant_p))
+		words.append(''.join(word))
+	return words
+
+def _conditional_costs( counts, contexts, outcomes ):
+	'''-log2 p(outcome | context) from pair counts, add one smoothed.'''
+	costs = {}
+	for context in contexts:
+		total = sum([counts.get((context, x), 0) + 1 for x in outcomes])
+		for outcome in outcomes:
+			costs[(context, outcome)] = -log(
+				(counts.get((context, outcome), 0) + 1.0)/total, 2)
+	return costs
+
+def statistics( words ):
+	'''Returns the bigram conditional costs, the vowel mutual informations and
+	the stress bigram conditional costs of words, keyed as
+	BoltzmannMinimizer and wfsa_generator key them.'''
+	bigrams = {}
+	vowel_pairs = {}
+	stress_pairs = {}
+	for word in words:
+		padded = BOUNDARY + word + BOUNDARY
+		for pair in zip(padded, padded[1:]):
+			bigrams[pair] = bigrams.get(pair, 0) + 1
+		vowels = [x for x in word if x in VOWELS]
+		ends_in_consonant = word[-1] not in VOWELS
+		tier = vowels + ([BOUNDARY] if ends_in_consonant else [])
+		for pair in zip(tier, tier[1:]):
+			vowel_pairs[pair] = vowel_pairs.get(pair, 0) + 1
+		stresses = [BOUNDARY] + [stress(x) for x in vowels] + [BOUNDARY]
+		for pair in zip(stresses, stresses[1:]):
+			stress_pairs[pair] = stress_pairs.get(pair, 0) + 1
+
+	#only the bigrams seen get arcs, as in bigram_plog_wfsa
+	cond_bigrams = dict([(x, y) for x, y in _conditional_costs(bigrams,
+		BOUNDARY + ALPHABET, ALPHABET + BOUNDARY).iteritems() if x in bigrams])
+
+	outcomes = list(VOWELS) + [BOUNDARY]
+	total = float(sum(vowel_pairs.values()) + len(VOWELS)*len(outcomes))
+	first = dict([(x, sum([vowel_pairs.get((x, y), 0) + 1 for y in outcomes]))
+		for x in VOWELS])
+	second = dict([(y, sum([vowel_pairs.get((x, y), 0) + 1 for x in VOWELS]))
+		for y in outcomes])
+	vowel_mi = {}
+	for x in VOWELS:
+		for y in outcomes:
+			vowel_mi[(x, y)] = log((vowel_pairs.get((x, y), 0) + 1)*total/
+				(first[x]*second[y]), 2)
+
+	stress_costs = _conditional_costs(stress_pairs, [BOUNDARY, 'S', 'U'],
+		['S', 'U', BOUNDARY])
+	return cond_bigrams, vowel_mi, stress_costs
+
+def bigram_machine( cond_bigrams ):
+	'''Each state is the last letter read.'''
+	stops = {}
+	arcs = {}
+	for (first, second), cost in cond_bigrams.iteritems():
+		if second == BOUNDARY:
+			stops[first] = cost
+		else:
+			arcs.setdefault(first, {})[second] = (second, cost)
+	return LogWFSA(ALPHABET, BOUNDARY, stops, arcs)
+
+def v_mi_machine( vowel_mi ):
+	'''A state for the last vowel read, and one for the last vowel read
+	followed by consonants. A vowel after a consonant costs the negative
+	mutual information between it and the last vowel.'''
+	stops = {BOUNDARY:0.0}
+	arcs = {BOUNDARY:{}}
+	for vowel in VOWELS:
+		arcs[BOUNDARY][vowel] = (vowel, 0.0)
+		arcs[vowel] = dict([(x, (x, 0.0)) for x in VOWELS])
+		arcs[vowel + 'CONS'] = dict([(x, (x, -vowel_mi[(vowel, x)]))
+			for x in VOWELS])
+		stops[vowel] = 0.0
+		stops[vowel + 'CONS'] = -vowel_mi[(vowel, BOUNDARY)]
+	for consonant in CONSONANTS:
+		arcs[BOUNDARY][consonant] = (BOUNDARY, 0.0)
+		for vowel in VOWELS:
+			arcs[vowel][consonant] = (vowel + 'CONS', 0.0)
+			arcs[vowel + 'CONS'][consonant] = (vowel + 'CONS', 0.0)
+	return LogWFSA(ALPHABET, BOUNDARY, stops, arcs)
+
+def stress_machine( stress_costs ):
+	'''Each state is the stress of the last vowel read.'''
+	stops = {}
+	arcs = {}
+	for state in [BOUNDARY, 'S', 'U']:
+		arcs[state] = dict([(x, (state, 0.0)) for x in CONSONANTS])
+		for vowel in VOWELS:
+			arcs[state][vowel] = (stress(vowel), stress_costs[(state,
+				stress(vowel))])
+		stops[state] = stress_costs[(state, BOUNDARY)]
+	return LogWFSA(ALPHABET, BOUNDARY, stops, arcs)
+
+class Stages( object ):
+	'''Accumulates the wall time spent in each named stage, and the peak
+	memory of the process when each stage last finished.'''
+	def __init__( self ):
+		self.order = []
+		self.seconds = {}
+		self.max_rss = {}
+
+	def run( self, name, function, *args ):
+		start = timeit.default_timer()
+		result = function(*args)
+		if name not in self.seconds:
+			self.order.append(name)
+			self.seconds[name] = 0.0
+		self.seconds[name] += timeit.default_timer() - start
+		self.max_rss[name] = peak_memory()
+		return result
+
+def peak_memory():
+	'''The peak resident set size of the process in kilobytes.'''
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def objective( stages, bigram_keys, vowel_keys, params, corpus ):
+	'''The cost in bits of corpus under the normalized intersection of the
+	bigram and vowel mutual information machines params describe, or inf if
+	the normalizer doesn't converge.'''
+	conditionals = dict(zip(bigram_keys, params[:len(bigram_keys)]))
+	v_mi = dict(zip(vowel_keys, params[len(bigram_keys):]))
+	bigram_model = stages.run('objective.build', bigram_machine, conditionals)
+	v_mi_model = stages.run('objective.build', v_mi_machine, v_mi)
+	model = stages.run('objective.intersect', v_mi_model.intersect,
+		bigram_model)
+	model = stages.run('objective.mult_wfsa', model.mult_wfsa)
+	norm, converged = stages.run('objective.norm_constant',
+		model.norm_constant, 1e-6, 200)
+	if not converged:
+		return float('inf')
+	def score():
+		return sum([-log(float(model.weight(x))/norm, 2) for x in corpus])
+	return stages.run('objective.score', score)
+
+def trajectory( params, steps, step_size, rng ):
+	'''steps parameter settings, each a random multiplicative perturbation of
+	the last, starting from params.'''
+	params = numpy.array(params, dtype=float)
+	settings = [list(params)]
+	for i in range(steps - 1):
+		params = params*numpy.exp(step_size*rng.standard_normal(len(params)))
+		settings.append(list(params))
+	return settings
+
+def run( options ):
+	'''Runs every stage and returns the results as a JSON-ready dict. The
+	results list has the layout of micro.run's, so micro.compare pairs up two
+	runs.'''
+	rng = numpy.random.RandomState(options.seed)
+	stages = Stages()
+	total_start = timeit.default_timer()
+
+	words = stages.run('lexicon', lexicon, options.words, rng)
+	stages.run('natural_classes', NaturalClassSet, ALPHABET, features())
+	cond_bigrams, vowel_mi, stress_costs = stages.run('statistics',
+		statistics, words)
+	bigram_model = stages.run('machines', bigram_machine, cond_bigrams)
+	v_mi_model = stages.run('machines', v_mi_machine, vowel_mi)
+	stress_model = stages.run('machines', stress_machine, stress_costs)
+	product = stages.run('intersect',
+		lambda: bigram_model.intersect(v_mi_model).intersect(stress_model))
+
+	bigram_keys = sorted(cond_bigrams)
+	vowel_keys = sorted(vowel_mi)
+	params = [cond_bigrams[x] for x in bigram_keys] + \
+		[vowel_mi[x] for x in vowel_keys]
+	corpus = words[:options.corpus]
+	costs = [objective(stages, bigram_keys, vowel_keys, x, corpus)
+		for x in trajectory(params, options.steps, options.step_size, rng)]
+	total = timeit.default_timer() - total_start
+
+	results = [{'benchmark':x, 'size':options.words,
+		'seconds':stages.seconds[x], 'max_rss_kb':stages.max_rss[x]}
+		for x in stages.order]
+	results.append({'benchmark':'total', 'size':options.words,
+		'seconds':total, 'max_rss_kb':peak_memory()})
+	settings = dict([(x, getattr(options, x)) for x in ['words', 'corpus',
+		'steps', 'step_size', 'seed']])
+	return {'environment':environment(), 'options':settings,
+		'results':results, 'states':len(product.state_names),
+		'objective':costs, 'peak_memory_kb':peak_memory()}
+
+def parse_args( argv ):
+	parser = argparse.ArgumentParser(description=
+		'Times an end to end phonotactic learning run.')
+	parser.add_argument('--words', type=int, default=5000,
+		help='size of the synthetic lexicon')
+	parser.add_argument('--corpus', type=int, default=500,
+		help='number of lexicon words the objective scores')
+	parser.add_argument('--steps', type=int, default=5,
+		help='number of objective evaluations')
+	parser.add_argument('--step-size', type=float, default=0.05,
+		help='standard deviation of the log of each parameter change')
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--output', help='file to write the JSON results to')
+	parser.add_argument('--compare',
+		help='JSON results of an earlier run to compare against')
+	parser.add_argument('--tolerance', type=float, default=None,
+		help='fail if the total time exceeds the baseline by this factor')
+	return parser.parse_args(argv)
+
+def main( argv = None ):
+	options = parse_args(sys.argv[1:] if argv is None else argv)
+	results = run(options)
+	for result in results['results']:
+		sys.stderr.write('%-24s %12.6f %10d kB\n' % (result['benchmark'],
+			result['seconds'], result['max_rss_kb']))
+	if options.output:
+		with open(options.output, 'w') as out:
+			json.dump(results, out, indent=1)
+	else:
+		json.dump(results, sys.stdout, indent=1)
+		sys.stdout.write('\n')
+	if options.compare:
+		with open(options.compare) as baseline:
+			pairs = compare(json.load(baseline), results)
+		for name, size, old, new, ratio in pairs:
+			sys.stderr.write('%-24s %12.6f %12.6f %7.2fx\n' %
+				(name, old, new, ratio))
+		if options.tolerance is not None:
+			for name, size, old, new, ratio in pairs:
+				if name == 'total' and ratio > options.tolerance:
+					sys.stderr.write('Slower than the baseline by more than '
+						+ str(options.tolerance) + 'x.\n')
+					return 1
+	return 0
+
+if __name__ == '__main__':
+	sys.exit(main())
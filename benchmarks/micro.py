@@ -0,0 +1,208 @@
+import sys
+import gc
+import json
+import time
+import timeit
+import platform
+import argparse
+import numpy
+from fsa.wfsa import MultWFSA, LogWFSA
+from fsa.benchmarks.generators import random_arcs, log_weights, \
+	random_corpus, random_param_wfsa, random_classes, alphabet, \
+	random_untrimmed_arcs
+from fsa.nat_class_set import NaturalClassSet
+
+'''Times the core machine operations on random machines of growing size and
+writes the timings as JSON, so that a run before a change can be compared with
+one after it:
+
+	python -m fsa.benchmarks.micro --output before.json
+	python -m fsa.benchmarks.micro --compare before.json
+
+Each timing is the best of --repeat runs. Machines and corpora are generated
+from --seed and the size alone, so the same sizes give the same machines.'''
+
+def best_time( function, repeat ):
+	'''The shortest of repeat wall clock timings of calling function.'''
+	best = float('inf')
+	for i in range(repeat):
+		gc.collect()
+		start = timeit.default_timer()
+		function()
+		best = min(best, timeit.default_timer() - start)
+	return best
+
+#Each benchmark takes the size to run at, the options and a RandomState, does
+#its setup and returns the call to time.
+
+def _arcs( size, options, rng ):
+	return random_arcs(size, options.alphabet, options.density, options.other,
+		rng)
+
+def _log_wfsa( size, options, rng ):
+	letters, stops, arcs = _arcs(size, options, rng)
+	stops, arcs = log_weights(stops, arcs)
+	return LogWFSA(letters, 0, stops, arcs)
+
+def init( size, options, rng ):
+	letters, stops, arcs = _arcs(size, options, rng)
+	stops, arcs = log_weights(stops, arcs)
+	return lambda: LogWFSA(letters, 0, stops, arcs)
+
+class _Untrimmed( LogWFSA ):
+	'''A LogWFSA whose constructor leaves its unreachable and dead states in,
+	for timing trim on a machine that needs trimming.'''
+	def trim( self ):
+		pass
+
+def trim( size, options, rng ):
+	letters, stops, arcs = random_untrimmed_arcs(size, options.alphabet,
+		options.density, options.other, rng)
+	stops, arcs = log_weights(stops, arcs)
+	#trimming changes the machine, so each timed call gets a fresh copy
+	machines = [_Untrimmed(letters, 0, stops, arcs)
+		for i in range(options.repeat)]
+	return lambda: LogWFSA.trim(machines.pop())
+
+def weight( size, options, rng ):
+	letters, stops, arcs = _arcs(size, options, rng)
+	corpus = random_corpus(MultWFSA(letters, 0, stops, arcs), options.words,
+		rng)
+	stops, arcs = log_weights(stops, arcs)
+	machine = LogWFSA(letters, 0, stops, arcs)
+	return lambda: [machine.weight(x) for x in corpus]
+
+def intersect( size, options, rng ):
+	machine = _log_wfsa(size, options, rng)
+	partner = _log_wfsa(options.partner, options, rng)
+	return lambda: machine.intersect(partner)
+
+def all_pairs_shortest( size, options, rng ):
+	return _log_wfsa(size, options, rng).all_pairs_shortest
+
+def push_weight( size, options, rng ):
+	letters, stops, arcs = _arcs(size, options, rng)
+	return MultWFSA(letters, 0, stops, arcs).push_weight
+
+def norm_constant( size, options, rng ):
+	letters, stops, arcs = _arcs(size, options, rng)
+	return MultWFSA(letters, 0, stops, arcs).norm_constant
+
+def set_parameter( size, options, rng ):
+	machine = random_param_wfsa(size, options.alphabet, options.params,
+		options.density, options.other, rng)
+	values = rng.exponential(2.0, options.params)
+	def set_all():
+		for index, value in enumerate(values):
+			machine.set_parameter(index, value)
+	return set_all
+
+def natural_classes( size, options, rng ):
+	letters = alphabet(options.alphabet)
+	classes = random_classes(letters, size, rng)
+	return lambda: NaturalClassSet(letters, classes)
+
+#(name, the option holding the sizes to run it at, benchmark)
+BENCHMARKS = [
+	('init', 'sizes', init),
+	('trim', 'sizes', trim),
+	('weight', 'sizes', weight),
+	('intersect', 'sizes', intersect),
+	('all_pairs_shortest', 'cubic_sizes', all_pairs_shortest),
+	('push_weight', 'cubic_sizes', push_weight),
+	('norm_constant', 'sizes', norm_constant),
+	('set_parameter', 'sizes', set_parameter),
+	('natural_classes', 'features', natural_classes),
+]
+
+def environment():
+	return {
+		'python':platform.python_version(),
+		'numpy':numpy.__version__,
+		'platform':platform.platform(),
+		'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+	}
+
+def run( options, out = None ):
+	'''Runs the benchmarks named in options.only, or all of them, at each of
+	their sizes and returns the results as a JSON-ready dict. Progress is
+	written to out if it is given.'''
+	results = []
+	for name, curve, benchmark in BENCHMARKS:
+		if options.only and name not in options.only:
+			continue
+		for size in getattr(options, curve):
+			rng = numpy.random.RandomState([options.seed, size])
+			seconds = best_time(benchmark(size, options, rng), options.repeat)
+			results.append({'benchmark':name, 'size':size, 'seconds':seconds})
+			if out is not None:
+				out.write('%-20s %6d %12.6f\n' % (name, size, seconds))
+	settings = dict([(x, getattr(options, x)) for x in ['alphabet', 'density',
+		'other', 'params', 'partner', 'words', 'repeat', 'seed']])
+	return {'environment':environment(), 'options':settings,
+		'results':results}
+
+def compare( baseline, current ):
+	'''Pairs up the timings of two runs: a list of (benchmark, size, baseline
+	seconds, current seconds, current/baseline) for every benchmark and size
+	both ran.'''
+	old = dict([((x['benchmark'], x['size']), x['seconds'])
+		for x in baseline['results']])
+	pairs = []
+	for result in current['results']:
+		key = (result['benchmark'], result['size'])
+		if key in old:
+			pairs.append(key + (old[key], result['seconds'],
+				result['seconds']/old[key] if old[key] > 0 else float('inf')))
+	return pairs
+
+def _sizes( text ):
+	return [int(x) for x in text.split(',') if x]
+
+def parse_args( argv ):
+	parser = argparse.ArgumentParser(description=
+		'Times machine operations on random machines of growing size.')
+	parser.add_argument('--sizes', type=_sizes, default=[10, 30, 100, 300],
+		help='numbers of states, comma separated')
+	parser.add_argument('--cubic-sizes', type=_sizes, default=[10, 30, 60],
+		help='numbers of states for the cubic time all pairs benchmarks')
+	parser.add_argument('--features', type=_sizes, default=[2, 3, 4, 5],
+		help='numbers of binary features for natural class construction')
+	parser.add_argument('--alphabet', type=int, default=26)
+	parser.add_argument('--density', type=float, default=0.5,
+		help='chance that a state has an explicit arc on a letter')
+	parser.add_argument('--other', action='store_true',
+		help="send the remaining letters of each state along an '_other' arc")
+	parser.add_argument('--params', type=int, default=20,
+		help='number of tied parameters for set_parameter')
+	parser.add_argument('--partner', type=int, default=8,
+		help='number of states of the machine intersected with')
+	parser.add_argument('--words', type=int, default=1000,
+		help='corpus size for weight')
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--only', type=lambda x: x.split(','), default=None,
+		help='benchmarks to run, comma separated')
+	parser.add_argument('--output', help='file to write the JSON results to')
+	parser.add_argument('--compare',
+		help='JSON results of an earlier run to compare against')
+	return parser.parse_args(argv)
+
+def main( argv = None ):
+	options = parse_args(sys.argv[1:] if argv is None else argv)
+	results = run(options, sys.stderr)
+	if options.output:
+		with open(options.output, 'w') as out:
+			json.dump(results, out, indent=1)
+	else:
+		json.dump(results, sys.stdout, indent=1)
+		sys.stdout.write('\n')
+	if options.compare:
+		with open(options.compare) as baseline:
+			pairs = compare(json.load(baseline), results)
+		for name, size, old, new, ratio in pairs:
+			sys.stderr.write('%-20s %6d %12.6f %12.6f %7.2fx\n' %
+				(name, size, old, new, ratio))
+
+if __name__ == '__main__':
+	main()
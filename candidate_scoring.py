@@ -0,0 +1,142 @@
+import numpy
+from nat_class_set import NaturalClassSet
+
+'''Scores whole families of constraint candidates against a corpus at once, so
+that class_bigram and class_tier_bigram machines only need to be built for the
+candidates that are actually selected.'''
+
+def encode_corpus( symbols, corpus, bound_strip = True ):
+	'''Maps every word in corpus to a numpy array of its symbol numbers in the
+	SymbolTable symbols. Word boundary symbols are stripped as in
+	WeightedFSA.weight.'''
+	encoded = []
+	for word in corpus:
+		if bound_strip and len(word) > 1 and word[0]=='#' and word[-1]=='#':
+			word = word[1:-1]
+		numbers = numpy.array(symbols.encode(word), dtype=int)
+		if (numbers < 0).any():
+			raise KeyError('%r has letters outside the alphabet.' % (word,))
+		encoded.append(numbers)
+	return encoded
+
+class CandidateScorer( object ):
+	'''
+	Counts the violations of every class_bigram(nat_class_set, c1, c2) candidate
+	and every class_tier_bigram(nat_class_set, tier, c1, c2) candidate for a
+	tier, over all pairs of natural classes c1, c2. Each natural class is kept
+	as a bitmask over the alphabet, so a single pass over the corpus collects
+	letter bigram counts, and the counts for every pair of classes are read off
+	with two matrix products.
+
+	>>> vowel = frozenset('aiu')
+	>>> high = frozenset('iu')
+	>>> cons = frozenset('ptk')
+	>>> classes = NaturalClassSet('aiuptk', set([vowel, high, cons]))
+	>>> scorer = CandidateScorer(classes, ['pati', 'tuki', '#kapa#'])
+	>>> observed, expected = scorer.bigram_counts()
+	>>> observed[scorer.class_index(cons), scorer.class_index(high)]
+	3.0
+	>>> observed, expected = scorer.tier_bigram_counts(vowel)
+	>>> observed[scorer.class_index(high), scorer.class_index(high)]
+	1.0
+	>>> observed[scorer.class_index(cons), scorer.class_index(vowel)]
+	0.0
+	'''
+	def __init__( self, nat_class_set, corpus, bound_strip = True ):
+		'''
+		nat_class_set: the NaturalClassSet whose classes are paired up.
+		corpus: a list of words. Each word is a sequence of letters from the
+			NaturalClassSet's alphabet.
+		'''
+		self.nat_class_set = nat_class_set
+		self.symbols = nat_class_set.symbols
+		self.letters = list(self.symbols)
+		encoded = encode_corpus(self.symbols, corpus, bound_strip)
+		self.classes = sorted(nat_class_set.classes,
+				key=lambda c: (len(c), sorted(c)))
+		self.__class_index = dict([(c, i) for i, c in enumerate(self.classes)])
+
+		#masks[i, j] is True iff letter j is in natural class i
+		self.masks = numpy.zeros((len(self.classes), len(self.letters)),
+				dtype=bool)
+		for i, class_ in enumerate(self.classes):
+			for letter in class_:
+				self.masks[i, self.symbols[letter]] = True
+
+		#the corpus is stored as one flat array of letters with a parallel
+		#array of word numbers, so that bigrams never straddle two words.
+		lengths = [len(word) for word in encoded]
+		if len(encoded) > 0:
+			self.__flat = numpy.concatenate(encoded + [numpy.zeros(0, dtype=int)])
+		else:
+			self.__flat = numpy.zeros(0, dtype=int)
+		self.__word_ids = numpy.repeat(numpy.arange(len(lengths)), lengths)
+
+	def class_index( self, class_ ):
+		'''The row and column of class_ in the matrices returned by the
+		*_counts methods.'''
+		return self.__class_index[frozenset(class_)]
+
+	def bigram_counts( self ):
+		'''Returns a pair (observed, expected) of square matrices over
+		self.classes. observed[i, j] is the number of violations of
+		class_bigram(nat_class_set, classes[i], classes[j]) in the corpus.
+		expected[i, j] is the number of violations expected if letters were
+		drawn independently with their corpus frequencies.'''
+		return self.__class_counts(self.__flat, self.__word_ids)
+
+	def tier_bigram_counts( self, tier ):
+		'''As bigram_counts, for class_tier_bigram(nat_class_set, tier, c1, c2).
+		Bigrams are counted over the projection of each word onto tier. Entries
+		for classes that are not contained in tier are 0.'''
+		tier_mask = numpy.zeros(len(self.letters), dtype=bool)
+		for letter in tier:
+			tier_mask[self.symbols[letter]] = True
+		on_tier = tier_mask[self.__flat]
+		observed, expected = self.__class_counts(self.__flat[on_tier],
+				self.__word_ids[on_tier])
+		in_tier = ~(self.masks & ~tier_mask).any(axis=1)
+		outside = ~numpy.outer(in_tier, in_tier)
+		observed[outside] = 0.0
+		expected[outside] = 0.0
+		return observed, expected
+
+	def candidates( self, observed, expected, limit = None ):
+		'''Ranks the candidates from one of the *_counts methods by their ratio
+		of observed to expected violations, most underrepresented first.
+		Returns a list of tuples (ratio, class1, class2, observed, expected),
+		leaving out pairs that are never expected to occur.'''
+		rows, columns = numpy.nonzero(expected > 0)
+		ratios = observed[rows, columns]/expected[rows, columns]
+		order = numpy.argsort(ratios, kind='mergesort')
+		if limit is not None:
+			order = order[:limit]
+		ret = []
+		for k in order:
+			i, j = rows[k], columns[k]
+			ret.append((ratios[k], self.classes[i], self.classes[j],
+				observed[i, j], expected[i, j]))
+		return ret
+
+	def __class_counts( self, flat, word_ids ):
+		num_letters = len(self.letters)
+		same_word = word_ids[:-1] == word_ids[1:]
+		pairs = flat[:-1][same_word]*num_letters + flat[1:][same_word]
+		letter_bigrams = numpy.bincount(pairs,
+				minlength=num_letters*num_letters).astype(float)
+		letter_bigrams = letter_bigrams.reshape((num_letters, num_letters))
+
+		unigrams = numpy.bincount(flat, minlength=num_letters).astype(float)
+		if unigrams.sum() > 0:
+			unigrams /= unigrams.sum()
+		expected_bigrams = letter_bigrams.sum()*numpy.outer(unigrams, unigrams)
+
+		masks = self.masks.astype(float)
+		observed = numpy.dot(numpy.dot(masks, letter_bigrams), masks.T)
+		expected = numpy.dot(numpy.dot(masks, expected_bigrams), masks.T)
+		return observed, expected
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
@@ -0,0 +1,611 @@
+import copy
+import heapq
+import numpy
+from precision import quantize, PackedWeights
+from semiring import Probability, Tropical
+
+'''A deterministic WeightedFSA compiled into dense numpy transition tables, for
+scoring many words at once.'''
+
+#marks the stop option in sampling tables
+_STOP = -1
+
+#the numpy counterpart of each semiring's times operation
+_TIMES = { Probability: numpy.multiply, Tropical: numpy.add }
+
+def _path_sums( dest, weights, stops, start, start_weight ):
+	'''The forward and backward weights of a probability machine given as
+	(states x letters) tables of destinations and weights: for each state, the
+	total weight of the paths from the start to it, start weight included,
+	and of the paths from it to the end of a word, stop weight included. Both
+	come from one linear solve each.'''
+	n = len(stops)
+	matrix = numpy.zeros((n, n))
+	rows = numpy.repeat(numpy.arange(n), dest.shape[1])
+	numpy.add.at(matrix, (rows, dest.ravel()), weights.ravel())
+	initial = numpy.zeros(n)
+	initial[start] = start_weight
+	#the sum over paths converges just when the spectral radius is below one
+	if n and numpy.abs(numpy.linalg.eigvals(matrix)).max() >= 1.0:
+		raise ValueError("The machine's total weight diverges.")
+	identity = numpy.eye(n)
+	return numpy.linalg.solve(identity - matrix.T, initial), \
+		numpy.linalg.solve(identity - matrix, stops)
+
+def _log2( weights, counts ):
+	'''The sum of counts times the base 2 log of weights, over the weights
+	counted at least once; -inf if one of those is zero.'''
+	used = counts > 0
+	with numpy.errstate(divide='ignore'):
+		return numpy.dot(counts[used], numpy.log2(weights[used]))
+
+class CompiledWFSA( object ):
+	'''
+	The transition function of a deterministic WeightedFSA as two dense tables,
+	dest[state, column] and arc_weights[state, column], plus a table of stop
+	weights. Rows are the machine's state numbers, so state 0 is the start
+	state, and the last row is a dead state that every missing transition
+	leads to. Columns are symbol numbers from a SymbolTable. Besides a column
+	per symbol there is a column for letters outside the table, which leads to
+	the dead state, and a padding column, which leaves every state unchanged,
+	used to line up words of different lengths.
+
+	A machine compiled with partition=True has a column per class of letters
+	that behave alike (see WeightedFSA.letter_classes) instead of one per
+	symbol. The columns array maps symbol numbers to columns, and encoding a
+	word applies it, so an encoded corpus can be scored as often as needed
+	without mapping letters again.
+
+	>>> from wfsa import LogWFSA
+	>>> arcs = {'#':{'a':('#', 1.0), 'b':('b', 2.0)}, 'b':{'a':('#', 0.5)}}
+	>>> machine = LogWFSA('ab', '#', {'#':0.0, 'b':3.0}, arcs).compile()
+	>>> machine.weight('aab')
+	7.0
+	>>> list(machine.weights(['ba', 'a', 'bb', 'c', '']))
+	[2.5, 1.0, inf, inf, 0.0]
+	>>> machine.k_best(3)
+	[('', 0.0), ('a', 1.0), ('aa', 2.0)]
+	>>> vowels = LogWFSA('aeioubcd', '0', {'0':0.0}, {'0':{'a':('0', 1.0),
+	...     'e':('0', 1.0), 'i':('0', 1.0), 'o':('0', 1.0), 'u':('0', 1.0),
+	...     '_other':('0', 0.0)}}).compile(partition=True)
+	>>> vowels.dest.shape
+	(2, 4)
+	>>> list(vowels.encode('bead'))
+	[1, 0, 0, 1]
+	>>> vowels.weight('bead')
+	2.0
+	'''
+	def __init__( self, wfsa, symbols = None, partition = False ):
+		'''
+		wfsa: the WeightedFSA to compile.
+		symbols: the SymbolTable whose numbers are the columns. Defaults to
+			wfsa.symbols. Machines compiled with the same table accept the same
+			encoded words.
+		partition: whether to give letters that behave alike one column.
+		'''
+		self.semiring = wfsa.semiring
+		self.times = _TIMES[wfsa.semiring]
+		if symbols is None:
+			symbols = wfsa.symbols
+		self.symbols = symbols
+		self.letters = list(symbols.symbols)
+
+		#the column of each of the table's symbols, and of wfsa's labels
+		if symbols is wfsa.symbols:
+			ids = range(len(self.letters))
+		else:
+			ids = [wfsa.symbols.get(x) for x in self.letters]
+		if partition:
+			letter_classes = wfsa.letter_classes()
+			classes = [letter_classes[x] if x >= 0 else -1 for x in ids]
+			numbers = {}
+			classes = [numbers.setdefault(x, len(numbers)) for x in classes]
+		else:
+			classes = range(len(self.letters))
+		columns = dict([(x, y) for x, y in zip(ids, classes)
+				if x in wfsa._labels])
+		self.unknown = len(set(classes))
+		self.pad = self.unknown + 1
+		self.columns = numpy.array(list(classes) + [self.unknown], dtype=int)
+
+		self.dead = len(wfsa._states())
+		num_states = self.dead + 1
+		zero = float(self.semiring.zero)
+		one = float(self.semiring.one)
+
+		self.dest = numpy.empty((num_states, self.pad + 1), dtype=int)
+		self.dest[:] = self.dead
+		self.dest[:, self.pad] = numpy.arange(num_states)
+		self.arc_weights = numpy.empty((num_states, self.pad + 1))
+		self.arc_weights[:] = zero
+		self.arc_weights[:, self.pad] = one
+		self.stops = numpy.empty(num_states)
+		self.stops[:] = zero
+
+		#a default arc fills the state's row before its other arcs overwrite
+		#their own columns
+		defaults = numpy.array(sorted(set(columns.values())), dtype=int)
+		for state in wfsa._states():
+			default = state.default()
+			if default is not None:
+				self.dest[state.name, defaults] = default[0]
+				self.arc_weights[state.name, defaults] = float(default[1])
+			for symbol, dest, weight in state.explicit_arcs():
+				if symbol in columns:
+					self.dest[state.name, columns[symbol]] = dest
+					self.arc_weights[state.name, columns[symbol]] = float(weight)
+		for state in wfsa._states():
+			self.stops[state.name] = float(state.stop())
+		self.start = 0
+		self.start_weight = float(wfsa._start_weight)
+		self.__tables = None
+
+	def __len__( self ):
+		'''The number of states, not counting the dead state.'''
+		return self.dead
+
+	def quantized( self, mantissa, exp ):
+		'''A copy of this machine with its arc weights rounded to mantissa and
+		exp bits, as a machine built with precision=True would have them. The
+		copy shares every table but the arc weights.'''
+		machine = copy.copy(self)
+		machine.arc_weights = quantize(numpy.asarray(self.arc_weights),
+				mantissa, exp)
+		machine.__tables = None
+		return machine
+
+	def reweighted( self, arc_weights, stops ):
+		'''A copy of this machine with new arc and stop weight tables, shaped
+		like the old ones. The copy shares the transition table.'''
+		machine = copy.copy(self)
+		machine.arc_weights = arc_weights
+		machine.stops = stops
+		machine.__tables = None
+		return machine
+
+	def pack( self, codes = True ):
+		'''Stores the arc weights in less memory, either as 16 bit codes into
+		a table of the distinct weights (see precision.PackedWeights), which is
+		exact, or as float32s if codes is False. Returns this machine.'''
+		if codes:
+			self.arc_weights = PackedWeights(self.arc_weights)
+		else:
+			self.arc_weights = numpy.asarray(self.arc_weights, dtype=numpy.float32)
+		return self
+
+	def encode( self, word, bound_strip = True ):
+		'''The array of columns for the letters of word.'''
+		if bound_strip and len(word) > 1 and word[0]=='#' and word[-1]=='#':
+			word = word[1:-1]
+		symbols = numpy.array(self.symbols.encode(word), dtype=int)
+		symbols[symbols >= len(self.letters)] = -1
+		return self.columns[symbols]
+
+	def column( self, symbol ):
+		'''The column for a single symbol.'''
+		number = self.symbols.get(symbol)
+		if number >= len(self.letters):
+			number = -1
+		return int(self.columns[number])
+
+	def cursor( self ):
+		'''A Cursor at the start state, for scoring a word as it is read.'''
+		return Cursor(self, self.start, self.start_weight)
+
+	def encode_batch( self, words, bound_strip = True ):
+		'''A (words x longest word) array of columns, with shorter words padded
+		out with the padding column.'''
+		encoded = [self.encode(x, bound_strip) for x in words]
+		length = max([len(x) for x in encoded] + [0])
+		batch = numpy.empty((len(encoded), length), dtype=int)
+		batch[:] = self.pad
+		for i, word in enumerate(encoded):
+			batch[i, :len(word)] = word
+		return batch
+
+	def weight( self, word, bound_strip = True ):
+		'''The weight of word as a float, as WeightedFSA.weight would compute.'''
+		return self.weights_encoded(self.encode(word, bound_strip)[None, :])[0]
+
+	def weights( self, words, bound_strip = True ):
+		'''An array holding the weight of each word in words.'''
+		return self.weights_encoded(self.encode_batch(words, bound_strip))
+
+	def weights_encoded( self, batch ):
+		'''An array holding the weight of each row of an encoded batch.'''
+		states = numpy.zeros(batch.shape[0], dtype=int)
+		states[:] = self.start
+		total = numpy.empty(batch.shape[0])
+		total[:] = self.start_weight
+		for position in range(batch.shape[1]):
+			letters = batch[:, position]
+			total = self.times(total, self.arc_weights[states, letters])
+			states = self.dest[states, letters]
+		return self.times(total, self.stops[states])
+
+	def usage_counts( self, batch ):
+		'''How often the rows of an encoded batch use each arc and stop: an
+		array shaped like dest counting the steps taken from each state on each
+		column, with the padding column left at zero, and an array counting the
+		states the rows end in.'''
+		width = self.dest.shape[1]
+		states = numpy.zeros(batch.shape[0], dtype=int)
+		states[:] = self.start
+		steps = []
+		for position in range(batch.shape[1]):
+			letters = batch[:, position]
+			steps.append(states*width + letters)
+			states = self.dest[states, letters]
+		steps = numpy.concatenate(steps + [numpy.zeros(0, dtype=int)])
+		arc_counts = numpy.bincount(steps, minlength=self.dest.size)
+		arc_counts = arc_counts.reshape(self.dest.shape)
+		arc_counts[:, self.pad] = 0
+		stop_counts = numpy.bincount(states, minlength=self.dest.shape[0])
+		return arc_counts, stop_counts
+
+	def transition_matrix( self ):
+		'''A (states x states) array whose entry [q, r] is the total weight of
+		the arcs from q to r, in the probability semiring.'''
+		self.__require(Probability)
+		num_states = self.dest.shape[0]
+		matrix = numpy.zeros((num_states, num_states))
+		rows = numpy.repeat(numpy.arange(num_states), self.unknown)
+		#a column stands for as many letters as it has
+		sizes = numpy.bincount(self.columns[:-1], minlength=self.unknown)
+		numpy.add.at(matrix, (rows, self.dest[:, :self.unknown].ravel()),
+				(self.arc_weights[:, :self.unknown]*sizes).ravel())
+		return matrix
+
+	def __letter_tables( self ):
+		'''The (states x symbols) tables of destinations and arc weights, one
+		column per symbol of self.letters however the machine is partitioned.'''
+		columns = self.columns[:-1]
+		return self.dest[:, columns], self.arc_weights[:, columns]
+
+	def backward( self ):
+		'''The array of backward weights: the semiring sum over all paths from
+		each state to the end of a word of the path weight, including the stop
+		weight. In the tropical semiring this is the cost of the cheapest way to
+		finish a word from each state.'''
+		if self.semiring is Tropical:
+			return self.__tropical_backward()
+		self.__require(Probability)
+		matrix = self.transition_matrix()
+		return numpy.linalg.solve(numpy.eye(matrix.shape[0]) - matrix, self.stops)
+
+	def __tropical_backward( self ):
+		#Bellman-Ford relaxation, run on every state at once
+		dest = self.dest[:, :self.unknown]
+		arc_weights = self.arc_weights[:, :self.unknown]
+		distance = self.stops.copy()
+		if self.unknown == 0:
+			return distance
+		for i in range(self.dest.shape[0] + 1):
+			relaxed = numpy.minimum(self.stops,
+					(arc_weights + distance[dest]).min(axis=1))
+			if numpy.array_equal(relaxed, distance):
+				return distance
+			distance = relaxed
+		raise ValueError('The machine has a cycle of negative cost.')
+
+	def forward( self ):
+		'''The array of forward weights in the probability semiring: the sum
+		over all paths from the start state to each state of the path weight,
+		including the start weight. A word drawn from the normalized
+		distribution visits each state forward*backward/normalizer times on
+		average.'''
+		self.__require(Probability)
+		dest, weights = self.__letter_tables()
+		return _path_sums(dest, weights, self.stops, self.start,
+			self.start_weight)[0]
+
+	def expected_counts( self ):
+		'''
+		The expected number of times a word drawn from the normalized
+		distribution uses each arc and each stop, and the normalizer: a
+		(states x letters) array whose [q, i] entry counts the arc from q on
+		self.letters[i], an array over states of stop counts, and the total
+		weight of all words.
+		'''
+		self.__require(Probability)
+		dest, weights = self.__letter_tables()
+		forward, backward = _path_sums(dest, weights, self.stops, self.start,
+			self.start_weight)
+		norm = self.start_weight*backward[self.start]
+		if norm <= 0:
+			raise ValueError('The machine gives no word any weight.')
+		arcs = forward[:, None]*weights*backward[dest]/norm
+		return arcs, forward*self.stops/norm, norm
+
+	def expected_length( self ):
+		'''The expected number of letters in a word drawn from the normalized
+		distribution.'''
+		return self.expected_counts()[0].sum()
+
+	def entropy( self ):
+		'''The entropy in bits of the normalized distribution over words. As
+		the machine is deterministic a word's weight is the product of the
+		weights on its path, so this is the log of the normalizer less the
+		expected log weight of the arcs and stop a word uses.'''
+		arcs, stops, norm = self.expected_counts()
+		weights = self.__letter_tables()[1]
+		return numpy.log2(norm) - numpy.log2(self.start_weight) - \
+			_log2(weights, arcs) - _log2(self.stops, stops)
+
+	def cross_entropy( self, reference ):
+		'''
+		The cross entropy in bits of the normalized distribution of the
+		probability machine reference, a WeightedFSA or a CompiledWFSA over the
+		same symbols, relative to this machine's: the expected number of bits
+		reference needs for a word drawn from this machine. It is inf if this
+		machine gives weight to a word reference doesn't.
+
+		The pairs of states the two machines reach on the same prefix are
+		found first, and the expected counts of the paths through those pairs
+		give how often a word uses each of reference's arcs and stops.
+		'''
+		self.__require(Probability)
+		if not isinstance(reference, CompiledWFSA):
+			reference = reference.compile(self.symbols)
+		elif reference.symbols is not self.symbols:
+			raise ValueError('The reference must use the same SymbolTable.')
+		dest, weights = self.__letter_tables()
+		ref_dest, ref_weights = reference._CompiledWFSA__letter_tables()
+
+		pairs = {(self.start, reference.start):0}
+		found = [(self.start, reference.start)]
+		product_dest = []
+		for state, ref_state in found:
+			if self.stops[state] > 0 and reference.stops[ref_state] == 0:
+				return float('inf')
+			used = weights[state] > 0
+			if (ref_weights[ref_state][used] == 0).any():
+				return float('inf')
+			row = numpy.empty(len(used), dtype=int)
+			for letter in numpy.flatnonzero(used):
+				pair = (dest[state, letter], ref_dest[ref_state, letter])
+				if pair not in pairs:
+					pairs[pair] = len(found)
+					found.append(pair)
+				row[letter] = pairs[pair]
+			row[~used] = -1
+			product_dest.append(row)
+		states, ref_states = [numpy.array(x, dtype=int) for x in zip(*found)]
+		product_dest = numpy.array(product_dest, dtype=int)
+		product_weights = weights[states]
+		#unused letters lead to a dead state of the product
+		product_dest[product_dest < 0] = len(found)
+		product_dest = numpy.vstack([product_dest,
+			numpy.repeat(len(found), len(used))[None, :]])
+		product_weights = numpy.vstack([product_weights,
+			numpy.zeros(len(used))])
+		product_stops = numpy.append(self.stops[states], 0.0)
+
+		forward, backward = _path_sums(product_dest, product_weights,
+			product_stops, 0, self.start_weight)
+		norm = self.start_weight*backward[0]
+		arcs = forward[:, None]*product_weights*backward[product_dest]/norm
+		stops = forward*product_stops/norm
+		ref_backward = _path_sums(ref_dest, ref_weights, reference.stops,
+			reference.start, reference.start_weight)[1]
+		ref_norm = reference.start_weight*ref_backward[reference.start]
+		return numpy.log2(ref_norm) - numpy.log2(reference.start_weight) - \
+			_log2(ref_weights[ref_states], arcs[:-1]) - \
+			_log2(reference.stops[ref_states], stops[:-1])
+
+	def k_best( self, k ):
+		'''The k words with the lowest cost, cheapest first, as a list of
+		(word, cost) pairs. This is a best-first search over partial words
+		ordered by the cost so far plus the cheapest cost to finish, so every
+		word is found in order and only the partial words that can lead to one
+		of the k best words are expanded.'''
+		self.__require(Tropical)
+		future = self.__tropical_backward()
+		inf = float('inf')
+		dest, arc_weights = self.__letter_tables()
+		arcs = []
+		for state in range(dest.shape[0]):
+			arcs.append([(letter, dest[state, letter], arc_weights[state, letter])
+				for letter in range(len(self.letters))
+				if future[dest[state, letter]] < inf and
+					arc_weights[state, letter] < inf])
+
+		#each partial word is an index into paths, which holds a pair of the
+		#partial word it extends and the letter added
+		paths = [None]
+		ret = []
+		cost = self.start_weight
+		queue = [(cost + future[self.start], 0, False, cost, self.start, 0)]
+		pushed = 1
+		while queue and len(ret) < k:
+			estimate, order, done, cost, state, path = heapq.heappop(queue)
+			if estimate == inf:
+				break
+			if done:
+				ret.append((self.__spell(paths, path), float(cost)))
+				continue
+			if self.stops[state] < inf:
+				stop_cost = cost + self.stops[state]
+				heapq.heappush(queue, (stop_cost, pushed, True, stop_cost, state,
+					path))
+				pushed += 1
+			for letter, dest, weight in arcs[state]:
+				paths.append((path, letter))
+				heapq.heappush(queue, (cost + weight + future[dest], pushed, False,
+						cost + weight, dest, len(paths)-1))
+				pushed += 1
+		return ret
+
+	def best_path( self ):
+		'''The (word, cost) pair with the lowest cost, or None if the machine
+		accepts no words.'''
+		best = self.k_best(1)
+		return best[0] if best else None
+
+	def __spell( self, paths, path ):
+		letters = []
+		while paths[path] is not None:
+			path, letter = paths[path]
+			letters.append(self.letters[letter])
+		letters.reverse()
+		return ''.join(letters)
+
+	def sample( self, n, rng = None ):
+		'''Draws n words from the distribution this machine defines over
+		words. rng is a numpy.random.RandomState; a fresh one is used if it is
+		None. The walkers are advanced in one vectorized batch, each step
+		drawing from per-state alias tables over the outgoing arcs and the
+		option to stop.'''
+		if rng is None:
+			rng = numpy.random.RandomState()
+		counts, accept, alias, outcome = self.__alias_tables()
+
+		states = numpy.zeros(n, dtype=int)
+		states[:] = self.start
+		alive = numpy.arange(n)
+		drawn_ids = []
+		drawn_letters = []
+		while alive.size > 0:
+			current = states[alive]
+			u = rng.random_sample(alive.size)*counts[current]
+			column = u.astype(int)
+			column = numpy.where(u - column < accept[current, column],
+					column, alias[current, column])
+			letters = outcome[current, column]
+			going = letters != _STOP
+			alive = alive[going]
+			letters = letters[going]
+			drawn_ids.append(alive)
+			drawn_letters.append(letters)
+			states[alive] = self.dest[current[going], self.columns[letters]]
+
+		if n == 0:
+			return []
+		#regroup the letters drawn at each step by word
+		ids = numpy.concatenate(drawn_ids)
+		order = numpy.argsort(ids, kind='mergesort')
+		letters = numpy.concatenate(drawn_letters)[order]
+		letters = [self.letters[x] for x in letters]
+		ends = numpy.cumsum(numpy.bincount(ids, minlength=n))
+		starts = numpy.concatenate([[0], ends[:-1]])
+		return [''.join(letters[x:y]) for x, y in zip(starts, ends)]
+
+	def __alias_tables( self ):
+		'''Walker's alias tables for each state's choice of outgoing letter or
+		stopping. Returns the number of outcomes for each state, and
+		(states x outcomes) arrays with the acceptance probability of each
+		column, the column's alias, and the letter (or _STOP) of each column.'''
+		if self.__tables is not None:
+			return self.__tables
+		self.__require(Probability)
+		dest, arc_weights = self.__letter_tables()
+		num_letters = len(self.letters)
+		choices = numpy.hstack([arc_weights, self.stops[:, None]])
+		totals = choices.sum(axis=1)
+		live = totals > 0
+		if not numpy.allclose(totals[live], 1.0):
+			#not locally normalized; push the backward weights onto the arcs
+			backward = self.backward()
+			live = backward > 0
+			choices[:, :num_letters] *= backward[dest]
+			choices[live] /= backward[live][:, None]
+			choices[~live] = 0.0
+		choices[choices < 0] = 0.0
+
+		num_states = choices.shape[0]
+		counts = (choices > 0).sum(axis=1)
+		width = max(counts.max(), 1)
+		accept = numpy.ones((num_states, width))
+		alias = numpy.zeros((num_states, width), dtype=int)
+		outcome = numpy.zeros((num_states, width), dtype=int)
+		for state in range(num_states):
+			columns = numpy.nonzero(choices[state] > 0)[0]
+			if len(columns) == 0:
+				continue
+			outcome[state, :len(columns)] = numpy.where(
+					columns == num_letters, _STOP, columns)
+			scaled = list(choices[state, columns]*len(columns)/
+					choices[state, columns].sum())
+			small = [i for i, p in enumerate(scaled) if p < 1.0]
+			large = [i for i, p in enumerate(scaled) if p >= 1.0]
+			while small and large:
+				less = small.pop()
+				more = large.pop()
+				accept[state, less] = scaled[less]
+				alias[state, less] = more
+				scaled[more] -= 1.0 - scaled[less]
+				if scaled[more] < 1.0:
+					small.append(more)
+				else:
+					large.append(more)
+			for i in small + large:
+				accept[state, i] = 1.0
+		self.__tables = (counts, accept, alias, outcome)
+		return self.__tables
+
+	def __require( self, semiring ):
+		if self.semiring is not semiring:
+			raise TypeError('This operation needs a machine over the ' +
+					semiring.name + 'semiring.')
+
+
+class Cursor( object ):
+	'''
+	A position in a CompiledWFSA after reading a prefix, with the prefix's
+	weight, for extending words one symbol at a time: advance reads a symbol,
+	fork copies the cursor so that a prefix can be extended in several ways,
+	and stop_cost is the weight of the prefix as a whole word. Each step
+	costs two table lookups, however long the prefix.
+
+	>>> from wfsa import LogWFSA
+	>>> arcs = {'#':{'a':('#', 1.0), 'b':('b', 2.0)}, 'b':{'a':('#', 0.5)}}
+	>>> machine = LogWFSA('ab', '#', {'#':0.0, 'b':3.0}, arcs).compile()
+	>>> cursor = machine.cursor().advance('a').advance('b')
+	>>> cursor.cost
+	3.0
+	>>> branch = cursor.fork().advance('a')
+	>>> branch.stop_cost(), cursor.stop_cost()
+	(3.5, 6.0)
+	>>> cursor.advance('b').alive(), cursor.stop_cost()
+	(False, inf)
+	'''
+	__slots__ = ('machine', 'state', 'cost')
+
+	def __init__( self, machine, state, cost ):
+		'''cost is the weight of the prefix read, in the machine's semiring,
+		so it is a probability for probability machines.'''
+		self.machine = machine
+		self.state = state
+		self.cost = cost
+
+	def advance( self, symbol ):
+		'''Reads one symbol and returns this cursor.'''
+		return self.advance_column(self.machine.column(symbol))
+
+	def advance_column( self, column ):
+		'''Reads the letters of one column, as encode gives them, and returns
+		this cursor.'''
+		machine = self.machine
+		self.cost = float(machine.times(self.cost,
+			machine.arc_weights[self.state, column]))
+		self.state = int(machine.dest[self.state, column])
+		return self
+
+	def fork( self ):
+		'''A copy of this cursor that advances independently of it.'''
+		return Cursor(self.machine, self.state, self.cost)
+
+	def stop_cost( self ):
+		'''The weight of the prefix read as a complete word.'''
+		return float(self.machine.times(self.cost,
+			self.machine.stops[self.state]))
+
+	def alive( self ):
+		'''Whether the prefix read has a path, that is, whether the cursor has
+		not fallen into the dead state.'''
+		return self.state != self.machine.dead
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
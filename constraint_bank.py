@@ -0,0 +1,97 @@
+import numpy
+from compiled_wfsa import CompiledWFSA
+from symbol_table import SymbolTable
+
+class ConstraintBank( object ):
+	'''
+	A set of deterministic constraint machines (such as CountingWFSAs) that are
+	run side by side over a batch of words. The compiled transition tables of
+	all the constraints are stacked into one table, so every step of the batch
+	advances each word in every constraint with a single gather, and the
+	intersection of the constraints is never built. Letters that every
+	constraint treats alike share a column of the stacked table.
+
+	>>> from wfsa import LogWFSA
+	>>> count_a = LogWFSA('ab', '0', {'0':0.0}, {'0':{'a':('0', 1.0), '_other':('0', 0.0)}})
+	>>> count_ab = LogWFSA('ab', '0', {'0':0.0, '1':0.0},
+	...     {'0':{'a':('1', 0.0), 'b':('0', 0.0)},
+	...      '1':{'a':('1', 0.0), 'b':('0', 1.0)}})
+	>>> bank = ConstraintBank([count_a, count_ab])
+	>>> bank.violations(['abab', 'bba', ''])
+	array([[2., 2.],
+	       [1., 0.],
+	       [0., 0.]])
+	'''
+	def __init__( self, constraints ):
+		'''
+		constraints: a list of deterministic WeightedFSAs, all over the same
+			semiring.
+		'''
+		self.constraints = list(constraints)
+		semirings = set([x.semiring for x in self.constraints])
+		if len(semirings) != 1:
+			raise ValueError('A ConstraintBank needs at least one constraint, '
+					'and all of its constraints must share a semiring.')
+		symbols = self.constraints[0].symbols
+		if len(set([id(x.symbols) for x in self.constraints])) > 1:
+			alphabet = set([])
+			for constraint in self.constraints:
+				alphabet.update(constraint.alphabet)
+			symbols = SymbolTable(alphabet)
+
+		compiled = [x.compile(symbols) for x in self.constraints]
+		self.symbols = symbols
+		self.times = compiled[0].times
+
+		#constraint i's states are rows offsets[i] to offsets[i+1]-1 of the
+		#stacked tables.
+		sizes = [x.dest.shape[0] for x in compiled]
+		self.offsets = numpy.cumsum([0] + sizes)
+		dest = numpy.vstack([x.dest + self.offsets[i]
+				for i, x in enumerate(compiled)])
+		arc_weights = numpy.vstack([x.arc_weights for x in compiled])
+
+		#merge the letter columns that are the same in every constraint;
+		#columns maps the symbol columns the encoder gives to merged ones
+		unknown = compiled[0].unknown
+		key = numpy.vstack([dest[:, :unknown], arc_weights[:, :unknown]])
+		first, classes = numpy.unique(key, axis=1, return_index=True,
+				return_inverse=True)[1:]
+		self.unknown = len(first)
+		self.pad = self.unknown + 1
+		self.columns = numpy.concatenate([classes, [self.unknown, self.pad]])
+		kept = numpy.concatenate([first, [unknown, unknown + 1]])
+		self.dest = dest[:, kept]
+		self.arc_weights = arc_weights[:, kept]
+		self.stops = numpy.concatenate([x.stops for x in compiled])
+		self.starts = self.offsets[:-1] + numpy.array([x.start for x in compiled])
+		self.start_weights = numpy.array([x.start_weight for x in compiled])
+		self.__encoder = compiled[0]
+
+	def __len__( self ):
+		return len(self.constraints)
+
+	def encode_batch( self, words, bound_strip = True ):
+		'''See CompiledWFSA.encode_batch.'''
+		return self.columns[self.__encoder.encode_batch(words, bound_strip)]
+
+	def violations( self, words, bound_strip = True ):
+		'''A (words x constraints) array whose entry [i, j] is the weight
+		constraint j assigns to word i.'''
+		return self.violations_encoded(self.encode_batch(words, bound_strip))
+
+	def violations_encoded( self, batch ):
+		'''As violations, for a batch from encode_batch.'''
+		num_words = batch.shape[0]
+		states = numpy.tile(self.starts, (num_words, 1))
+		total = numpy.tile(self.start_weights, (num_words, 1))
+		for position in range(batch.shape[1]):
+			letters = batch[:, position][:, None]
+			total = self.times(total, self.arc_weights[states, letters])
+			states = self.dest[states, letters]
+		return self.times(total, self.stops[states])
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
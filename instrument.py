@@ -0,0 +1,162 @@
+from contextlib import contextmanager
+from timeit import default_timer
+
+'''Opt in counters and timers for machine operations.
+
+Nothing is counted until enable() is called or a recording() block is entered.
+Enabling swaps timing and counting wrappers in for the operations below, and
+disabling puts the original methods back, so a disabled run executes exactly
+the uninstrumented code. The only hooks left in the library are the count and
+latest calls a few operations make once per call, which return at once when
+counting is off.
+
+The counters are
+	transitions: State.transition calls, one for each letter weight() reads
+	semiring_ops: Probability and Tropical additions, products and quotients
+	states_constructed: States (and subclasses) built
+	states_trimmed: States removed by trim
+	intersect.pairs: pairs of states explored by intersect
+	norm_constant.iterations: iterations norm_constant ran
+	norm_constant.residual: the weight that stopped on the last iteration of
+		the latest norm_constant; unlike the others it isn't a running total
+	weight.rejected: words weight() found no path for
+and for each timed operation x, time.x holds the total seconds spent in it and
+calls.x the number of calls.'''
+
+_enabled = False
+_stats = {}
+#counters holding the latest value instead of a running total
+_LATEST = frozenset(['norm_constant.residual'])
+
+#(module, class, method) of the operations timed while counting is on
+_TIMED = [
+	('wfsa', 'WeightedFSA', 'weight'),
+	('wfsa', 'WeightedFSA', 'trim'),
+	('wfsa', 'WeightedFSA', 'intersect'),
+	('wfsa', 'WeightedFSA', 'all_pairs_shortest'),
+	('wfsa', 'WeightedFSA', 'push_weight'),
+	('wfsa', 'WeightedFSA', 'compile'),
+	('wfsa', 'MultWFSA', 'norm_constant'),
+	('param_wfsa', 'ParametrizedWFSA', 'set_parameter'),
+]
+#(module, class, method, counter) of the operations counted while counting is
+#on
+_COUNTED = [
+	('state', 'State', '__init__', 'states_constructed'),
+	('state', 'State', 'transition', 'transitions'),
+] + [('semiring', semiring, method, 'semiring_ops')
+	for semiring in ['Probability', 'Tropical']
+	for method in ['__add__', '__mul__', '__div__']]
+
+#(class, method name, original function) of every method replaced
+_patched = []
+
+def count( key, n = 1 ):
+	'''Adds n to the counter key if counting is on.'''
+	if _enabled:
+		_stats[key] = _stats.get(key, 0) + n
+
+def latest( key, value ):
+	'''Sets the counter key to value if counting is on.'''
+	if _enabled:
+		_stats[key] = value
+
+def _timed( name, function ):
+	def timed( *args, **kwargs ):
+		start = default_timer()
+		try:
+			return function(*args, **kwargs)
+		finally:
+			count('time.' + name, default_timer() - start)
+			count('calls.' + name)
+	timed.__name__ = function.__name__
+	timed.__doc__ = function.__doc__
+	return timed
+
+def _counted( key, function ):
+	def counted( *args, **kwargs ):
+		count(key)
+		return function(*args, **kwargs)
+	counted.__name__ = function.__name__
+	counted.__doc__ = function.__doc__
+	return counted
+
+def _class( module, name ):
+	return getattr(__import__(module, globals(), locals(), [name]), name)
+
+def enable():
+	'''Starts counting, adding to the counters already held.'''
+	global _enabled
+	if _enabled:
+		return
+	for module, name, method in _TIMED:
+		cls = _class(module, name)
+		original = cls.__dict__[method]
+		_patched.append((cls, method, original))
+		setattr(cls, method, _timed(method, original))
+	for module, name, method, key in _COUNTED:
+		cls = _class(module, name)
+		original = cls.__dict__[method]
+		_patched.append((cls, method, original))
+		setattr(cls, method, _counted(key, original))
+	_enabled = True
+
+def disable():
+	'''Stops counting and restores the uninstrumented methods. The counters
+	are kept.'''
+	global _enabled
+	while _patched:
+		cls, method, original = _patched.pop()
+		setattr(cls, method, original)
+	_enabled = False
+
+def is_enabled():
+	return _enabled
+
+def reset():
+	'''Clears the counters.'''
+	_stats.clear()
+
+def stats():
+	'''A copy of the counters.'''
+	return dict(_stats)
+
+@contextmanager
+def recording():
+	'''
+	Counts everything done inside a with block into a fresh dict, which the
+	block receives and which stays filled in afterwards, e.g. to scope the
+	counts to one optimizer step. The counts are added to those of an
+	enclosing block or of the global counters on the way out, and counting is
+	turned back off if it was off before.
+
+	>>> from wfsa import MultWFSA
+	>>> machine = MultWFSA('ab', 0, {0:0.5}, {0:{'a':(0, 0.25), 'b':(0, 0.25)}})
+	>>> with recording() as stats:
+	...     weight = machine.weight('abba')
+	>>> stats['transitions'], stats['calls.weight']
+	(4, 1)
+	>>> is_enabled()
+	False
+	'''
+	global _stats
+	outer = _stats
+	was_enabled = _enabled
+	_stats = {}
+	enable()
+	try:
+		yield _stats
+	finally:
+		scope = _stats
+		_stats = outer
+		for key, value in scope.iteritems():
+			if key in _LATEST:
+				outer[key] = value
+			else:
+				outer[key] = outer.get(key, 0) + value
+		if not was_enabled:
+			disable()
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
@@ -1,6 +1,10 @@
+from symbol_table import SymbolTable
+
 class NaturalClassSet( object ):
     def __init__(self, alphabet, classes ):
         self.alphabet = frozenset(alphabet)
+        #shared by every machine built over this alphabet
+        self.symbols = SymbolTable.for_alphabet(self.alphabet)
         classes = self._fill_natural_classes(classes)
         for letter in self.alphabet:
             classes.add(frozenset([letter]))
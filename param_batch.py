@@ -0,0 +1,255 @@
+import numpy
+
+'''Evaluating many parameter vectors of one ParametrizedWFSA at once, and
+views of a ParametrizedWFSA with parameters of their own.'''
+
+class ParameterBatch( object ):
+	'''
+	The corpus costs and normalizers of a ParametrizedWFSA under many
+	parameter vectors, computed from one compilation of the machine.
+
+	Every arc and stop weight of the machine is a constant, from arcs tied to
+	the default weight, plus the parameters it is tied to, so the weights of K
+	parameter vectors are gathered as a (K x arcs) array. The corpus is run
+	through the machine once to count how often each arc and stop is used,
+	which makes the K corpus costs a single matrix product, and the K
+	normalizers come from one batched linear solve over the probability
+	transition matrices.
+
+	>>> from param_wfsa import ParametrizedWFSA, parametrized_states
+	>>> from arc_set import ArcSet
+	>>> states = parametrized_states('ab', [ArcSet('$', '$', 'a', 0),
+	...     ArcSet('$', '$', 'b', 1)], {'$':-1}, [1.0, 2.0])
+	>>> machine = ParametrizedWFSA('ab', '$', states, [1.0, 2.0])
+	>>> costs, norms = machine.evaluate([[1.0, 2.0], [1.0, 1.0]], ['ab', 'a'])
+	>>> list(costs), list(norms)
+	([4.0, 3.0], [4.0, inf])
+	'''
+	def __init__( self, machine, corpus = None, bound_strip = True ):
+		'''
+		machine: the ParametrizedWFSA. Its topology and ties are read now, so
+			later changes to its parameters don't affect the batch.
+		corpus: the words to cost, if costs are wanted.
+		'''
+		compiled = machine.compile()
+		self.compiled = compiled
+		num_states = compiled.dead
+		width = compiled.unknown
+		self.num_states = num_states
+		self.num_params = len(machine._params)
+
+		#the cells of the (states x letters) tables that have arcs, numbered
+		#in row major order; cell_index maps a cell to its number
+		dest = compiled.dest[:num_states, :width]
+		active = dest != compiled.dead
+		self.active = active
+		self.sources = numpy.nonzero(active)[0]
+		self.dests = dest[active]
+		cell_index = -numpy.ones((num_states, width), dtype=int)
+		cell_index[active] = numpy.arange(active.sum())
+		arc_weights = numpy.asarray(compiled.arc_weights)[:num_states, :width]
+		stops = compiled.stops[:num_states]
+
+		#(arc cell, parameter) and (state, parameter) pairs for every tie
+		arc_ties = []
+		stop_ties = []
+		columns = compiled.columns
+		for state in machine._states():
+			row = cell_index[state.name]
+			explicit = set([columns[x] for x in state._letters])
+			for index in state.parameters_used():
+				for label in state._parameter_map[index]:
+					if label == '_stop':
+						stop_ties.append((state.name, index))
+					elif label == '_other':
+						arc_ties.extend([(row[x], index) for x in range(width)
+							if x not in explicit and row[x] >= 0])
+					elif row[columns[label]] >= 0:
+						arc_ties.append((row[columns[label]], index))
+		self.arc_ties = numpy.array(arc_ties, dtype=int).reshape(-1, 2)
+		self.stop_ties = numpy.array(stop_ties, dtype=int).reshape(-1, 2)
+
+		#the constant part of each weight is what is left after taking away the
+		#machine's current parameters
+		params = numpy.asarray(machine._params, dtype=float)
+		self.arc_constants = arc_weights[active] - numpy.bincount(
+			self.arc_ties[:, 0], params[self.arc_ties[:, 1]],
+			minlength=len(self.dests))
+		self.stop_constants = stops - numpy.bincount(self.stop_ties[:, 0],
+			params[self.stop_ties[:, 1]], minlength=num_states)
+		self.start = compiled.start
+		self.start_weight = compiled.start_weight
+
+		#the corpus cost is linear in the parameters: constant + gradient.p
+		self.cost_constant = None
+		if corpus is None:
+			return
+		self.num_words = len(corpus)
+		arc_counts, stop_counts = compiled.usage_counts(
+			compiled.encode_batch(corpus, bound_strip))
+		arc_counts = arc_counts[:, :width]
+		stop_counts = stop_counts.astype(float)
+		if arc_counts[:num_states][~active].any() or \
+				arc_counts[num_states:].any() or stop_counts[num_states:].any() \
+				or numpy.isinf(stops[stop_counts[:num_states] > 0]).any():
+			#some word has no path, whatever the parameters
+			self.cost_constant = float('inf')
+		else:
+			counts = arc_counts[:num_states][active].astype(float)
+			stop_counts = stop_counts[:num_states]
+			#unused stops may be infinite
+			used = counts > 0
+			ended = stop_counts > 0
+			self.cost_constant = len(corpus)*self.start_weight + \
+				numpy.dot(counts[used], self.arc_constants[used]) + \
+				numpy.dot(stop_counts[ended], self.stop_constants[ended])
+			self.gradient = numpy.bincount(self.arc_ties[:, 1],
+				counts[self.arc_ties[:, 0]], minlength=self.num_params) + \
+				numpy.bincount(self.stop_ties[:, 1],
+				stop_counts[self.stop_ties[:, 0]], minlength=self.num_params)
+
+	def weights( self, parameters ):
+		'''The (K x arcs) arc weights and (K x states) stop weights for a
+		(K x params) array of parameter vectors.'''
+		parameters = self.__check(parameters)
+		k = parameters.shape[0]
+		arcs = numpy.tile(self.arc_constants, (k, 1))
+		numpy.add.at(arcs, (slice(None), self.arc_ties[:, 0]),
+			parameters[:, self.arc_ties[:, 1]])
+		stops = numpy.tile(self.stop_constants, (k, 1))
+		numpy.add.at(stops, (slice(None), self.stop_ties[:, 0]),
+			parameters[:, self.stop_ties[:, 1]])
+		return arcs, stops
+
+	def costs( self, parameters ):
+		'''The K costs of the corpus, the sums of the weights of its words.'''
+		parameters = self.__check(parameters)
+		if self.cost_constant is None:
+			raise ValueError('The batch was built without a corpus.')
+		if numpy.isinf(self.cost_constant):
+			return numpy.repeat(self.cost_constant, parameters.shape[0])
+		return self.cost_constant + numpy.dot(parameters, self.gradient)
+
+	def normalizers( self, parameters ):
+		'''
+		The K total probabilities of all words, with weights read as negative
+		base 2 logs as in mult_wfsa: the values norm_constant of each
+		machine's mult_wfsa converges to. They are solved for directly, from
+		b = stops + M b for each (states x states) transition matrix M. A
+		parameter vector under which the total diverges gets inf.
+		'''
+		arcs, stops = self.weights(parameters)
+		k = arcs.shape[0]
+		n = self.num_states
+		matrices = numpy.zeros((k, n*n))
+		numpy.add.at(matrices, (slice(None), self.sources*n + self.dests),
+			numpy.exp2(-arcs))
+		matrices = matrices.reshape(k, n, n)
+		#the sum over paths converges just when the spectral radius is below
+		#one; the diverging systems are zeroed so that the solve can't fail
+		diverges = numpy.abs(numpy.linalg.eigvals(matrices)).max(axis=1) >= 1.0
+		matrices[diverges] = 0.0
+		backward = numpy.linalg.solve(numpy.eye(n) - matrices,
+			numpy.exp2(-stops)[:, :, None])[:, :, 0]
+		norms = numpy.exp2(-self.start_weight)*backward[:, self.start]
+		norms[diverges] = float('inf')
+		return norms
+
+	def evaluate( self, parameters ):
+		'''The K corpus costs and the K normalizers.'''
+		return self.costs(parameters), self.normalizers(parameters)
+
+	def __check( self, parameters ):
+		parameters = numpy.atleast_2d(numpy.asarray(parameters, dtype=float))
+		if parameters.shape[1] != self.num_params:
+			raise ValueError('Expected ' + str(self.num_params) +
+				' parameters per vector, not ' + str(parameters.shape[1]) + '.')
+		return parameters
+
+
+class ParameterView( object ):
+	'''
+	A parameter vector of its own over the topology of a ParametrizedWFSA.
+	Views of one machine share its states, arcs and ties, held by a
+	ParameterBatch, and set_parameter, snapshot, restore and branch only touch
+	the vector, so they take time in proportion to the number of parameters.
+	Arc weights are worked out from the constants and the vector whenever the
+	view is scored after a change, rather than adjusted a ratio at a time, so
+	no rounding error builds up however often parameters change.
+
+	>>> from param_wfsa import ParametrizedWFSA, parametrized_states
+	>>> from arc_set import ArcSet
+	>>> states = parametrized_states('ab', [ArcSet('$', '$', 'a', 0),
+	...     ArcSet('$', '$', 'b', 1)], {'$':-1}, [1.0, 2.0])
+	>>> view = ParametrizedWFSA('ab', '$', states, [1.0, 2.0]).view()
+	>>> saved = view.snapshot()
+	>>> view.set_parameter(0, 3.0)
+	>>> branch = view.branch()
+	>>> branch.set_parameter(1, 0.5)
+	>>> view.weight('ab'), branch.weight('ab')
+	(5.0, 3.5)
+	>>> view.restore(saved)
+	>>> view.weight('ab')
+	3.0
+	'''
+	def __init__( self, topology, parameters ):
+		'''
+		topology: the ParameterBatch of the machine.
+		parameters: the view's parameter vector, which is copied.
+		'''
+		self.topology = topology
+		self.parameters = numpy.array(parameters, dtype=float)
+		self.__compiled = None
+
+	def set_parameter( self, index, value ):
+		self.parameters[index] = value
+		self.__compiled = None
+
+	def snapshot( self ):
+		'''A copy of the parameter vector, for restore.'''
+		return self.parameters.copy()
+
+	def restore( self, snapshot ):
+		'''Sets every parameter from a vector snapshot returned.'''
+		self.parameters[:] = snapshot
+		self.__compiled = None
+
+	def branch( self ):
+		'''A new view over the same topology starting from this view's
+		parameters.'''
+		return ParameterView(self.topology, self.parameters)
+
+	def compile( self ):
+		'''The CompiledWFSA with this view's weights. It shares its
+		transition table with the topology's, and is kept until a parameter
+		changes.'''
+		if self.__compiled is None:
+			topology = self.topology
+			arcs, stops = topology.weights(self.parameters)
+			compiled = topology.compiled
+			arc_weights = numpy.array(compiled.arc_weights, dtype=float)
+			arc_weights[:topology.num_states, :compiled.unknown][
+				topology.active] = arcs[0]
+			all_stops = compiled.stops.copy()
+			all_stops[:topology.num_states] = stops[0]
+			self.__compiled = compiled.reweighted(arc_weights, all_stops)
+		return self.__compiled
+
+	def weight( self, word, bound_strip = True ):
+		return self.compile().weight(word, bound_strip)
+
+	def weights( self, words, bound_strip = True ):
+		return self.compile().weights(words, bound_strip)
+
+	def cost( self ):
+		'''The cost of the corpus the topology was built with.'''
+		return self.topology.costs(self.parameters)[0]
+
+	def norm_constant( self ):
+		'''The total probability of all words; see ParameterBatch.normalizers.'''
+		return self.topology.normalizers(self.parameters)[0]
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
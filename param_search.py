@@ -0,0 +1,162 @@
+import itertools
+import multiprocessing
+import numpy
+from param_batch import ParameterBatch
+
+'''Searching the parameters of a ParametrizedWFSA with a pool of worker
+processes. Each worker builds the machine and counts the corpus once, when it
+starts; after that only parameter vectors go to the workers and only scores
+come back.'''
+
+#the ParameterBatch of a worker process, built by _start_worker, or the
+#error building it raised
+_batch = None
+_normalized = True
+_error = None
+
+def _start_worker( builder, args, corpus, bound_strip, normalized ):
+	#an initializer that raises makes the pool start workers forever, so the
+	#error is kept to be raised by the worker's first task instead
+	global _batch, _normalized, _error
+	try:
+		_batch = ParameterBatch(builder(*args), corpus, bound_strip)
+	except Exception as error:
+		_error = error
+	_normalized = normalized
+
+def _worker_batch():
+	if _error is not None:
+		raise _error
+	return _batch
+
+def _num_params():
+	return _worker_batch().num_params
+
+def _evaluate( parameters ):
+	return _score(_worker_batch(), _normalized, parameters)
+
+def _score( batch, normalized, parameters ):
+	costs, norms = batch.evaluate(parameters)
+	if normalized:
+		costs = costs + batch.num_words*numpy.log2(norms)
+	return costs
+
+class ParameterSearch( object ):
+	'''
+	Scores parameter vectors of a ParametrizedWFSA against a corpus in a pool
+	of processes. The score of a vector is the corpus cost in bits under the
+	distribution the machine defines with those parameters, the corpus cost
+	plus the number of words times the log of the normalizer, or just the
+	corpus cost if normalized is False. Lower is better, and a vector under
+	which the normalizer diverges scores inf.
+
+	The machine is built in each worker by calling builder(*args), so builder
+	must be a function defined at the top level of a module. With processes=0
+	everything runs in this process, which is handy for debugging.
+
+		with ParameterSearch(build_grammar, (lexicon,), corpus) as search:
+			best, score = search.random_restarts(32, 0.0, 8.0,
+				steps=[-0.5, 0.5])
+	'''
+	def __init__( self, builder, args = (), corpus = (), processes = None,
+			normalized = True, chunk = 16, bound_strip = True ):
+		'''
+		processes: the number of workers, by default one per CPU.
+		chunk: the number of vectors sent to a worker at a time; each chunk is
+			scored with one batched evaluation.
+		'''
+		self.chunk = chunk
+		self.normalized = normalized
+		if processes == 0:
+			#the batch is this search's own, so searches don't share it
+			self.pool = None
+			self.batch = ParameterBatch(builder(*args), list(corpus),
+				bound_strip)
+			self.num_params = self.batch.num_params
+		else:
+			self.batch = None
+			self.pool = multiprocessing.Pool(processes, _start_worker,
+				(builder, args, list(corpus), bound_strip, normalized))
+			#a worker has built the machine already, so it is asked for the
+			#number of parameters rather than building it again here
+			try:
+				self.num_params = self.pool.apply(_num_params)
+			except:
+				self.pool.terminate()
+				self.pool.join()
+				self.pool = None
+				raise
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, *error ):
+		self.close()
+
+	def close( self ):
+		if self.pool is not None:
+			self.pool.close()
+			self.pool.join()
+			self.pool = None
+
+	def evaluate( self, candidates ):
+		'''The array of scores of the rows of a (vectors x parameters)
+		array.'''
+		candidates = numpy.atleast_2d(numpy.asarray(candidates, dtype=float))
+		chunks = [candidates[i:i + self.chunk]
+			for i in range(0, len(candidates), self.chunk)]
+		if not chunks:
+			return numpy.zeros(0)
+		if self.pool is None:
+			scores = [_score(self.batch, self.normalized, x) for x in chunks]
+		else:
+			scores = self.pool.map(_evaluate, chunks)
+		return numpy.concatenate(scores)
+
+	def grid( self, axes ):
+		'''The best vector of the grid with axes[i] as the values of parameter
+		i, and its score.'''
+		candidates = numpy.array(list(itertools.product(*axes)), dtype=float)
+		scores = self.evaluate(candidates)
+		best = scores.argmin()
+		return candidates[best], scores[best]
+
+	def coordinate_sweep( self, start, steps, sweeps = 1 ):
+		'''Improves start one parameter at a time: each parameter in turn is
+		moved by whichever of steps most lowers the score, if any does, and
+		this is repeated sweeps times. Returns the vector reached and its
+		score.'''
+		current = numpy.array([start], dtype=float)
+		vectors, scores = self.__sweep(current, self.evaluate(current), steps,
+			sweeps)
+		return vectors[0], scores[0]
+
+	def random_restarts( self, n, low, high, steps = None, sweeps = 1,
+			rng = None ):
+		'''Draws n vectors uniformly between low and high, which may be
+		numbers or per parameter arrays, improves each with coordinate sweeps
+		if steps are given, and returns the best vector and its score. The
+		sweeps of all the restarts are scored together.'''
+		if rng is None:
+			rng = numpy.random.RandomState()
+		current = rng.uniform(low, high, (n, self.num_params))
+		scores = self.evaluate(current)
+		if steps is not None:
+			current, scores = self.__sweep(current, scores, steps, sweeps)
+		best = scores.argmin()
+		return current[best], scores[best]
+
+	def __sweep( self, current, scores, steps, sweeps ):
+		steps = numpy.asarray(steps, dtype=float)
+		n = len(current)
+		rows = numpy.arange(n)
+		for sweep in range(sweeps):
+			for index in range(self.num_params):
+				candidates = numpy.repeat(current, len(steps), axis=0)
+				candidates[:, index] += numpy.tile(steps, n)
+				moved = self.evaluate(candidates).reshape(n, len(steps))
+				best = moved.argmin(axis=1)
+				better = moved[rows, best] < scores
+				current[better, index] += steps[best[better]]
+				scores[better] = moved[rows, best][better]
+		return current, scores
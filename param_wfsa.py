@@ -1,45 +1,67 @@
 from wfsa import *
+from wfsa import _bytes
 from semiring import *
 from arc_set import ArcSet
+from symbol_table import SymbolTable
 
-def parametrized_states( alphabet, arcsets, stops, parameters, default=Tropical.one ):
-	state_names = set([x.source for x in arcsets])
+'''Machines whose arc and stop weights are tied to shared parameters.
+
+A ParametrizedWFSA's complexity is its description length in bits: the
+arcs, stops and parameters it has, with each parameter weight_len bits long.
+It used to be fixed at 0, so objectives that add the complexities of an
+intersection chain, as the Boltzmann minimizers do, now come out larger by
+the sum of the components' description lengths. The length doesn't depend
+on parameter values, so it is a constant offset for a fixed topology.'''
+
+def parametrized_states( alphabet, arcsets, stops, parameters, default=Tropical.one,
+		symbols=None ):
+	'''Builds the ParametrizedStates for a ParametrizedWFSA. Arcs are labeled
+	with the numbers symbols gives their letters, by default the SymbolTable
+	shared by machines over alphabet.'''
+	if symbols is None:
+		symbols = SymbolTable.for_alphabet(alphabet)
+	labels = frozenset([symbols[x] for x in alphabet])
+	weights = [Tropical(x) for x in parameters]
 	
 	#constructing a parameter map for each state and changing the arcset
-	#weight to the weight on the parameter it points to
+	#weight to the weight on the parameter it points to, grouping the
+	#converted arcsets by source state as we go
 	parameter_maps = {}
-	converted_arcsets = []
+	converted_arcsets = {}
 
 	for a in arcsets:
 		#make a copy so that the arcset can be reused in specifying another machine
 		#if appropriate.
-		arcset = ArcSet(a.source, a.dest, a.letters, a.weight)
+		arcset = ArcSet(a.source, a.dest, [symbols[x] if x != '_other' else x
+			for x in a.letters], a.weight)
 		if arcset.source not in parameter_maps:
-			parameter_maps[arcset.source] = []
-			for i in range(len(parameters)):
-				parameter_maps[arcset.source].append(set([]))
+			parameter_maps[arcset.source] = {}
+			converted_arcsets[arcset.source] = []
 		if arcset.weight >= 0:
-			parameter_maps[arcset.source][arcset.weight].update(arcset.letters)
-			arcset.weight = Tropical(parameters[arcset.weight])
+			parameter_maps[arcset.source].setdefault(arcset.weight,
+				set([])).update(arcset.letters)
+			arcset.weight = weights[arcset.weight]
 		else:
 			arcset.weight = default
-		converted_arcsets.append(arcset)
+		converted_arcsets[arcset.source].append(arcset)
 	
 	states = []
 	converted_stops = {}
+	state_names = converted_arcsets.keys()
 	for name in state_names:
 		if name in stops:
 			if stops[name] >= 0:
-				parameter_maps[name][stops[name]].add('_stop')
-				converted_stops[name] = Tropical(parameters[stops[name]])
+				parameter_maps[name].setdefault(stops[name], set([])).add('_stop')
+				converted_stops[name] = weights[stops[name]]
 			else:
 				converted_stops[name] = default
 		else:
 			converted_stops[name] = Tropical.zero
 		
 	for name in state_names:
-		states.append( ParametrizedState(name, alphabet, converted_stops[name], 
-			parameter_maps[name],[x for x in converted_arcsets if x.source == name]
+		states.append( ParametrizedState(name, labels, converted_stops[name], 
+			parameter_maps[name], converted_arcsets[name],
+			num_params=len(parameters)
 		))
 	return states
 
@@ -54,40 +76,67 @@ class ParametrizedWFSA( LogWFSA ):
 				weight.
 		'''
 		self._params = parameters
-		self.__states_with_parameter = []
-		for index in range(len(parameters)):
-			self.__states_with_parameter.append(
-				[s for s in states if s.uses_parameter(index)]
-			)
-		self.complexity = 0
+		self.__states_with_parameter = [[] for x in parameters]
+		for state in states:
+			for index in state.parameters_used():
+				self.__states_with_parameter[index].append(state)
 		LogWFSA.__init__( self, alphabet, start, None, None, precision, 
 				m, e, False, states )
-		#self.complexity = self._complexity()
 	
 	def set_parameter(self, index, value):
+		#the description length counts the parameters, not their values, so
+		#the cached complexity stays valid
 		old_value = self._params[index]
 		for state in self.__states_with_parameter[index]:
 			state.change_parameter(index, Tropical(value), Tropical(old_value))
 		self._params[index] = value
 		
+	def evaluate(self, parameters, corpus, bound_strip = True):
+		'''The corpus costs and normalizers of this machine under each row of
+		a (K x parameters) array, as two arrays of K values, without changing
+		its parameters. See param_batch.ParameterBatch, which can be kept to
+		evaluate the same corpus again.'''
+		import param_batch
+		return param_batch.ParameterBatch(self, corpus,
+			bound_strip).evaluate(parameters)
+
+	def view(self, corpus = None, bound_strip = True):
+		'''A param_batch.ParameterView starting from this machine's parameters,
+		over a snapshot of its topology. Views branched from it share the
+		topology. If corpus is given, the views can cost it.'''
+		import param_batch
+		return param_batch.ParameterView(param_batch.ParameterBatch(self,
+			corpus, bound_strip), self._params)
+
 	def trim(self):
 		WeightedFSA.trim(self)
+		kept = set([id(s) for s in self._states()])
 		for index, states in enumerate(self.__states_with_parameter):
 			self.__states_with_parameter[index] = \
-					filter( lambda s: s.name in self.state_names, states )
+					filter( lambda s: id(s) in kept, states )
 					
 	
-	def _complexity(self):
-		states = integer_code_len(len(self.states))
-		param = integer_code_len(len(self.params))
+	def _parameter_bytes(self, seen):
+		return LogWFSA._parameter_bytes(self, seen) + \
+			_bytes([self._params, self.__states_with_parameter], seen) + \
+			_bytes(self._params, seen) + \
+			_bytes(self.__states_with_parameter, seen)
+
+	def _complexity(self, weight_len=None):
+		if weight_len is None:
+			weight_len = self.weight_len
+		states = self._states()
+		try:
+			num_arcs = sum([s.num_arcs() for s in states])
+		except TypeError:
+			return None
+		num_stops = len([s for s in states if s.stop() != Tropical.zero])
+		param = integer_code_len(len(self._params))
 		
-		num_arcs = 0
-		weight_cost = log(len(self.params)+1, 2)
-		for state, out in self.arcs.items():
-			for letter, dest in out.items():
-				num_arcs += 1
-		state_cost = log(len(self.states),2)
+		weight_cost = log(len(self._params)+1, 2)
+		state_cost = log(len(states),2)
 		return num_arcs*(2*state_cost + log(len(self.alphabet)+1,2) + weight_cost) + \
-			len(self.stops)*(state_cost + weight_cost) + len(self.params)*self.weight_len\
-			+ integer_code_len(num_arcs) + param + states + stops
+			num_stops*(state_cost + weight_cost) + len(self._params)*weight_len\
+			+ integer_code_len(num_arcs) + param + integer_code_len(len(states)) \
+			+ integer_code_len(num_stops)
 
@@ -0,0 +1,130 @@
+import numpy
+from semiring import Probability
+
+'''Fixed precision weights: rounding whole arrays of weights to a mantissa and
+exponent size at once, and storing the rounded weights compactly.'''
+
+def quantize( weights, mantissa, exp ):
+	'''
+	Rounds every weight in an array to mantissa bits of mantissa, as
+	WeightedFSA.round does for one weight. Weights too small for an exp bit
+	exponent become 0.0, and weights too large for it raise a
+	WFSAOverflowError.
+
+	>>> list(quantize([0.1, 3.0, -2.7, 1e-12, 0.0], 4, 3))
+	[0.1015625, 3.0, -2.75, 0.0, 0.0]
+	>>> quantize([300.0], 4, 3)
+	Traceback (most recent call last):
+	    ...
+	WFSAOverflowError: 3 bit exponent is too small to represent 300.0.
+	'''
+	weights = numpy.asarray(weights, dtype=float)
+	fractions, exponents = numpy.frexp(weights)
+	over = exponents > 2**(exp-1)
+	if over.any():
+		raise WFSAOverflowError(mantissa, exp, weights[over].flat[0])
+	#round half away from zero, as round does
+	scale = float(2**mantissa)
+	fractions = numpy.sign(fractions)*numpy.floor(
+			numpy.abs(fractions)*scale + 0.5)/scale
+	quantized = numpy.ldexp(fractions, exponents)
+	quantized[exponents < -(2**(exp-1))] = 0.0
+	return quantized
+
+
+def sweep( wfsa, corpus, settings, bound_strip = True ):
+	'''
+	Evaluates wfsa at every (mantissa, exp) pair in settings, as if it had
+	been built with precision=True and those sizes. Returns a list of
+	(mantissa, exp, complexity, cost) tuples: the machine's description
+	length with weights of 1 + mantissa + exp bits, and the cost of corpus in
+	bits with the arc weights rounded to that size (the total weight for
+	tropical machines, the negative log2 of it for probability machines).
+	Settings whose exponent can't hold some weight the corpus uses cost inf.
+
+	The counts of how often the corpus uses each arc and stop come from
+	wfsa.usage_counts, which keeps them for later sweeps over the same
+	corpus, and the structural part of the complexity is worked out once, so
+	each setting costs a rounding of the weights that are used and a dot
+	product, whatever the size of the corpus or machine.
+	'''
+	compiled = wfsa.compile()
+	arc_counts, stop_counts = wfsa.usage_counts(corpus, bound_strip)
+	used = arc_counts > 0
+	counts = arc_counts[used]
+	weights = numpy.asarray(compiled.arc_weights)[used]
+	stopped = stop_counts > 0
+
+	def bits( weights ):
+		if compiled.semiring is Probability:
+			with numpy.errstate(divide='ignore'):
+				return -numpy.log2(weights)
+		return weights
+	#stop and start weights aren't rounded
+	fixed = numpy.dot(stop_counts[stopped], bits(compiled.stops[stopped])) + \
+			len(corpus)*bits(compiled.start_weight)
+
+	terms = wfsa._complexity_terms()
+	results = []
+	for mantissa, exp in settings:
+		weight_len = 1 + mantissa + exp + (1 if wfsa.zero else 0)
+		complexity = None
+		if terms is not None:
+			complexity = terms[0] + terms[1]*weight_len
+		try:
+			rounded = quantize(weights, mantissa, exp)
+		except WFSAOverflowError:
+			cost = float('inf')
+		else:
+			cost = float(fixed + numpy.dot(counts, bits(rounded)))
+		results.append((mantissa, exp, complexity, cost))
+	return results
+
+
+class PackedWeights( object ):
+	'''
+	A table of weights stored as 16 bit codes into an array of the distinct
+	weights in it. A machine whose weights were rounded to a 16 bit budget or
+	less has few enough distinct weights to pack. Indexing the table as a numpy
+	array gives float arrays.
+
+	>>> table = PackedWeights(numpy.array([[0.5, 2.0], [2.0, numpy.inf]]))
+	>>> table.codes.dtype
+	dtype('uint16')
+	>>> table[1, 1], list(table[:, 1])
+	(inf, [2.0, inf])
+	'''
+	def __init__( self, weights ):
+		weights = numpy.asarray(weights)
+		self.values, codes = numpy.unique(weights, return_inverse=True)
+		if len(self.values) > 2**16:
+			raise ValueError('Too many distinct weights to pack: ' +
+					str(len(self.values)))
+		self.codes = codes.astype(numpy.uint16).reshape(weights.shape)
+		self.shape = weights.shape
+
+	def __getitem__( self, key ):
+		return self.values[self.codes[key]]
+
+	def __array__( self, dtype = None ):
+		return numpy.asarray(self.values[self.codes], dtype)
+
+	@property
+	def nbytes( self ):
+		return self.codes.nbytes + self.values.nbytes
+
+
+class WFSAOverflowError(Exception):
+	def __init__( self, mantissa, exp, number ):
+		self.mantissa = mantissa
+		self.exp = exp
+		self.number = number
+
+	def __str__(self):
+		return str(self.exp)+' bit exponent is too small to represent '\
+			+str(self.number)+'.'
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
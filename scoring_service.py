@@ -0,0 +1,267 @@
+import sys
+import json
+import time
+import socket
+import threading
+import Queue
+import SocketServer
+import cPickle
+from param_wfsa import ParametrizedWFSA
+from param_batch import ParameterBatch, ParameterView
+
+'''A long running process that scores words with machines kept compiled in
+memory, serving requests over a local TCP or Unix socket. Requests that arrive
+together are scored together in one vectorized CompiledWFSA.weights call.
+
+Messages are JSON objects, one per line. {"model": name, "words": [...]}
+is answered with {"weights": [...]}; {"model": name, "parameters": [...]}
+replaces the parameters of a ParametrizedWFSA model and is answered with
+{"ok": true}; {"models": null} is answered with the list of model names.
+Failures are answered with {"error": message}.
+
+	python -m fsa.scoring_service --tcp 127.0.0.1:8765 bigram=bigram.pickle
+
+serves the pickled machine in bigram.pickle as the model bigram.'''
+
+class ScoringError(Exception):
+	'''A request the service answered with an error.'''
+
+class _Request( object ):
+	__slots__ = ('model', 'words', 'done', 'weights', 'error')
+
+	def __init__( self, model, words ):
+		self.model = model
+		self.words = words
+		self.done = threading.Event()
+		self.weights = None
+		self.error = None
+
+def _check_words( words ):
+	if not isinstance(words, (list, tuple)) or not all([
+			isinstance(x, basestring) or (isinstance(x, (list, tuple)) and
+			all([isinstance(y, basestring) for y in x])) for x in words]):
+		raise TypeError('words must be a list of strings or of lists of '
+			'symbols.')
+
+class ScoringService( object ):
+	'''
+	Named machines, each kept compiled, and a thread that scores the requests
+	waiting for them in micro-batches. The thread takes the first waiting
+	request, then keeps taking requests until it holds max_batch words or
+	max_wait seconds have passed, and scores the words for each model with one
+	call.
+
+	Changing a ParametrizedWFSA model's parameters builds a new compiled
+	machine and then swaps it in, so every batch is scored entirely with the
+	old parameters or entirely with the new ones. The new machine's weights
+	are worked out from the model's topology and the new vector, as in a
+	param_batch.ParameterView, so the model itself is never changed and no
+	rounding error builds up over many swaps.
+	'''
+	def __init__( self, max_batch = 512, max_wait = 0.002 ):
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		#name -> (machine, compiled machine, ParameterBatch or None)
+		self.__models = {}
+		self.__swap_lock = threading.Lock()
+		self.__queue = Queue.Queue()
+		self.__batcher = threading.Thread(target=self.__run)
+		self.__batcher.daemon = True
+		self.__batcher.start()
+
+	def add_model( self, name, wfsa ):
+		'''Serves wfsa, a WeightedFSA or a CompiledWFSA, as name.'''
+		compiled = wfsa.compile() if hasattr(wfsa, 'compile') else wfsa
+		topology = None
+		if isinstance(wfsa, ParametrizedWFSA):
+			topology = ParameterBatch(wfsa)
+		with self.__swap_lock:
+			self.__models[name] = (wfsa, compiled, topology)
+
+	def models( self ):
+		return sorted(self.__models)
+
+	def set_parameters( self, name, parameters ):
+		'''Replaces every parameter of the ParametrizedWFSA model name.'''
+		wfsa, compiled, topology = self.__models[name]
+		if topology is None:
+			raise TypeError(str(name) + ' is not a parametrized model.')
+		if not isinstance(parameters, (list, tuple)) or \
+				len(parameters) != topology.num_params:
+			raise ValueError(str(name) + ' takes a list of ' +
+				str(topology.num_params) + ' parameters.')
+		#everything that can fail happens before the swap
+		compiled = ParameterView(topology, parameters).compile()
+		with self.__swap_lock:
+			self.__models[name] = (wfsa, compiled, topology)
+
+	def score( self, name, words ):
+		'''The weights of words under the model name, as a list of floats.
+		Blocks until the batch holding them is scored. words is a list of
+		words, each a string or a list of symbols.'''
+		_check_words(words)
+		request = _Request(name, words)
+		self.__queue.put(request)
+		request.done.wait()
+		if request.error is not None:
+			raise request.error
+		return request.weights
+
+	def handle( self, message ):
+		'''The reply to a decoded request message.'''
+		try:
+			if 'models' in message:
+				return {'models':self.models()}
+			if 'parameters' in message:
+				self.set_parameters(message['model'], message['parameters'])
+				return {'ok':True}
+			return {'weights':self.score(message['model'], message['words'])}
+		except KeyError as error:
+			return {'error':'Unknown model or missing field ' + str(error)}
+		except Exception as error:
+			return {'error':str(error)}
+
+	def close( self ):
+		'''Stops the batching thread once the waiting requests are scored.'''
+		self.__queue.put(None)
+		self.__batcher.join()
+
+	def __run( self ):
+		while True:
+			first = self.__queue.get()
+			if first is None:
+				return
+			batch = [first]
+			size = len(first.words)
+			deadline = time.time() + self.max_wait
+			stopping = False
+			while size < self.max_batch:
+				timeout = deadline - time.time()
+				if timeout <= 0:
+					break
+				try:
+					request = self.__queue.get(timeout=timeout)
+				except Queue.Empty:
+					break
+				if request is None:
+					stopping = True
+					break
+				batch.append(request)
+				size += len(request.words)
+			self.__score(batch)
+			if stopping:
+				return
+
+	def __score( self, batch ):
+		by_model = {}
+		for request in batch:
+			by_model.setdefault(request.model, []).append(request)
+		#a failure only fails the requests for one model, and every request
+		#is answered whatever happens, so no caller waits forever
+		for name, requests in by_model.iteritems():
+			try:
+				compiled = self.__models[name][1]
+				words = [x for request in requests for x in request.words]
+				weights = [float(x) for x in compiled.weights(words)]
+				start = 0
+				for request in requests:
+					request.weights = weights[start:start + len(request.words)]
+					start += len(request.words)
+			except Exception as error:
+				for request in requests:
+					request.error = error
+			finally:
+				for request in requests:
+					request.done.set()
+
+
+class _Handler( SocketServer.StreamRequestHandler ):
+	def handle( self ):
+		while True:
+			line = self.rfile.readline()
+			if not line:
+				return
+			try:
+				reply = self.server.service.handle(json.loads(line))
+			except ValueError as error:
+				reply = {'error':'Malformed request: ' + str(error)}
+			self.wfile.write(json.dumps(reply) + '\n')
+			self.wfile.flush()
+
+class TCPServer( SocketServer.ThreadingMixIn, SocketServer.TCPServer ):
+	daemon_threads = True
+	allow_reuse_address = True
+
+class UnixServer( SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer ):
+	daemon_threads = True
+
+def server( service, address ):
+	'''A server for service on address, a Unix socket path or a (host, port)
+	pair, with a thread per connection. Call its serve_forever method to run
+	it.'''
+	if isinstance(address, basestring):
+		listener = UnixServer(address, _Handler)
+	else:
+		listener = TCPServer(address, _Handler)
+	listener.service = service
+	return listener
+
+
+class Client( object ):
+	'''A connection to a scoring service at address, as server takes it.'''
+	def __init__( self, address ):
+		family = socket.AF_UNIX if isinstance(address, basestring) \
+			else socket.AF_INET
+		self.socket = socket.socket(family, socket.SOCK_STREAM)
+		self.socket.connect(address)
+		self.file = self.socket.makefile('rw')
+
+	def request( self, message ):
+		self.file.write(json.dumps(message) + '\n')
+		self.file.flush()
+		reply = json.loads(self.file.readline())
+		if 'error' in reply:
+			raise ScoringError(reply['error'])
+		return reply
+
+	def score( self, model, words ):
+		return self.request({'model':model, 'words':list(words)})['weights']
+
+	def set_parameters( self, model, parameters ):
+		self.request({'model':model, 'parameters':list(parameters)})
+
+	def models( self ):
+		return self.request({'models':None})['models']
+
+	def close( self ):
+		self.file.close()
+		self.socket.close()
+
+
+def main( argv = None ):
+	import argparse
+	parser = argparse.ArgumentParser(description=
+		'Serves pickled machines for scoring words.')
+	parser.add_argument('--tcp', help='host:port to listen on')
+	parser.add_argument('--unix', help='Unix socket path to listen on')
+	parser.add_argument('--max-batch', type=int, default=512)
+	parser.add_argument('--max-wait', type=float, default=0.002)
+	parser.add_argument('models', nargs='+', help='name=pickle file')
+	options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+	if (options.tcp is None) == (options.unix is None):
+		parser.error('Give exactly one of --tcp and --unix.')
+
+	service = ScoringService(options.max_batch, options.max_wait)
+	for model in options.models:
+		name, path = model.split('=', 1)
+		with open(path, 'rb') as machine:
+			service.add_model(name, cPickle.load(machine))
+	if options.tcp is not None:
+		host, port = options.tcp.rsplit(':', 1)
+		address = (host, int(port))
+	else:
+		address = options.unix
+	server(service, address).serve_forever()
+
+if __name__ == '__main__':
+	main()
@@ -1,4 +1,7 @@
 from arc_set import *
+from arc_set import _get_covering_labels, _slot_state, _set_slot_state
+from bisect import bisect_left
+from itertools import izip
 from math import log
 import semiring
 
@@ -21,9 +24,13 @@ class State(object):
 	('2', 4)
 	>>> state2.transition('b')
 	(None, None)
-	>>> state3 = state.combine(state2)
+	>>> pairs = {}
+	>>> number = lambda x, y: pairs.setdefault((x, y), len(pairs)+1)
+	>>> state3 = state.combine(state2, 0, number)
 	>>> state3.transition('a')
-	('2%2', 16)
+	(1, 16)
+	>>> sorted(pairs.items())
+	[(('2', '2'), 1), (('3', '3'), 2)]
 	>>> state3.transition('b')
 	(None, None)
 	>>> state3.stop()
@@ -38,131 +45,325 @@ class State(object):
 	('2', 0.0625 in a probability semiring.)
 	>>> state5.stop()
 	0.25 in a probability semiring.
+
+	The special letter '_other' labels a default arc, taken on every letter of
+	the alphabet that has no arc of its own.
+
+	>>> set4 = ArcSet('1', '1', ['_other'], 1)
+	>>> state6 = State('1', 'abcdefghijou', 2, [set1, set4])
+	>>> state6.transition('e')
+	('2', 4)
+	>>> state6.transition('j')
+	('1', 1)
+	>>> state6.transition('z')
+	(None, None)
+	>>> state6.optimal_arcs()['_other']
+	('1', 1)
+	>>> state7 = state6.combine(state, 0, number)
+	>>> state7.transition('j')[1]
+	12
+	>>> state7.default() is None
+	True
+	>>> state8 = state6.combine(state6, 0, number)
+	>>> state8.default()[1]
+	1
+	>>> len(list(state8.explicit_arcs()))
+	5
+	>>> tables = [{}, {}, {}, {}]
+	>>> state.share_row(tables)
+	>>> twin = State('1', 'abcdefghijou', 1, [set3, set2, set1])
+	>>> twin.share_row(tables)
+	>>> twin._weights is state._weights and twin.same_arcs(state)
+	True
 	'''
+	#States are stored by the hundred thousand in large products, so they keep
+	#their arcs in parallel tuples sorted by letter rather than in dicts, and
+	#every state of a machine shares the machine's alphabet. The tuples are
+	#never changed in place, so states with the same arcs can share them; see
+	#share_row.
+	__slots__ = ('name', '_alphabet', '_stop_weight', '_letters', '_dests',
+		'_weights', '_default')
+
 	def __init__(self, name, alphabet, stop_weight, arcsets=None,
-            transitions=None):
+            transitions=None, default=None):
+		'''
+		Either arcsets or transitions must be given.
+		transitions: dict(letter -> pair(destination state, arc weight)), or the
+			triple (letters, dests, weights) of parallel sequences, with letters
+			sorted.
+		default: the pair (destination state, arc weight) for letters that
+			aren't in transitions, or None.
+		'''
 		self.name = name
+		#frozenset gives back a frozenset argument itself, so this is shared
+		#when the machine passes its own alphabet
 		self._alphabet = frozenset(alphabet)
 		self._stop_weight = stop_weight
-		if transitions is not None:
-			self._transitions = transitions
-			self._arcs = None
-		else:
+		self._default = default
+		if transitions is None:
 			if arcsets is None:
 				raise TypeError('Must specify either arcsets or transitions')
-			self.__arcsets = arcsets
-			self._transitions = {}
+			self._validate_arcsets(arcsets)
+			transitions = {}
 			for arcset in arcsets:
 				if arcset.source != name:
 					raise IllegalState(
 						"The State's name must be identical to the source " +
-						"for each ArcSet. " + name + ' != ' + arcset.source
+						"for each ArcSet. " + str(name) + ' != ' +
+						str(arcset.source)
 					)
 				for letter in arcset:
-					self._transitions[letter] = (arcset.dest, arcset.weight)
-			self._arcs = self._optimal_arcs(arcsets)
-	
+					if letter == '_other':
+						self._default = (arcset.dest, arcset.weight)
+					else:
+						transitions[letter] = (arcset.dest, arcset.weight)
+		if isinstance(transitions, dict):
+			letters = sorted(transitions)
+			self._letters = tuple(letters)
+			self._dests = tuple([transitions[x][0] for x in letters])
+			self._weights = tuple([transitions[x][1] for x in letters])
+		else:
+			letters, dests, weights = transitions
+			self._letters = tuple(letters)
+			self._dests = tuple(dests)
+			self._weights = tuple(weights)
+
+	def __getstate__(self):
+		return _slot_state(self)
+
+	def __setstate__(self, state):
+		_set_slot_state(self, state)
+
 	def stop(self):
 		return self._stop_weight
-		
+
+	def _find(self, letter):
+		'''The index of letter's explicit arc, or -1.'''
+		i = bisect_left(self._letters, letter)
+		if i < len(self._letters) and self._letters[i] == letter:
+			return i
+		return -1
+
 	def transition(self, letter):
-		return self._transitions[letter] \
-			if letter in self._transitions else (None, None)
-		
-	def combine( self, other ):
-		name = self.name + '%' + other.name
+		i = self._find(letter)
+		if i >= 0:
+			return (self._dests[i], self._weights[i])
+		if self._default is not None and letter in self._alphabet:
+			return self._default
+		return (None, None)
+
+	def default(self):
+		'''The (dest, weight) pair of the default arc, or None.'''
+		return self._default
+
+	def explicit_arcs(self):
+		'''Iterates over the (letter, dest, weight) triples of the arcs that
+		aren't covered by the default arc, in order of letter.'''
+		return izip(self._letters, self._dests, self._weights)
+
+	def arcs(self):
+		'''Iterates over the (letter, dest, weight) triples of this state's
+		outgoing arcs, with the default arc repeated for each letter it covers.'''
+		for arc in self.explicit_arcs():
+			yield arc
+		if self._default is not None:
+			dest, weight = self._default
+			for letter in self._alphabet:
+				if self._find(letter) < 0:
+					yield letter, dest, weight
+
+	def combine( self, other, name, number, labels=None ):
+		'''The state of an intersection machine that is in this state and
+		other at once. name is the new state's name, and number(dest1, dest2)
+		names the state for being in dest1 and dest2 at once. If other labels
+		its arcs differently, labels maps this state's labels to other's.'''
 		stop_weight = self.stop()*other.stop()
-		transitions = {}
-		for letter, (dest1, w1) in self._transitions.items():
-			dest2, w2 = other.transition(letter)
-			if dest2 is not None:
-				transitions[letter] = (dest1+'%'+dest2, w1*w2)
-		return State(name, self._alphabet, stop_weight, transitions=transitions)
-		
-	def _optimal_arcs(self, arcsets):
-		largest = set([])
-		letters_covered = frozenset([])
-		for arcset in arcsets:
-			letters_covered = letters_covered.union(arcset.letters)
-			if len(largest) < len(arcset):
-				largest = arcset
-		arcs = {}
-		for arcset in arcsets:
-			if arcset == largest and letters_covered == self._alphabet:
-				arcs['_other'] = (arcset.dest, arcset.weight)
+		if labels is not None or not (self._alphabet is other._alphabet or
+				self._alphabet == other._alphabet):
+			transitions = {}
+			for letter, dest1, w1 in self.arcs():
+				dest2, w2 = other.transition(
+					letter if labels is None else labels[letter])
+				if dest2 is not None:
+					transitions[letter] = (number(dest1, dest2), w1*w2)
+			return State(name, self._alphabet, stop_weight,
+				transitions=transitions)
+
+		#merge the two sorted lists of explicit arcs; a letter that only one
+		#of the states has an explicit arc for uses the other's default arc,
+		#and the rest use both defaults
+		letters = []
+		dests = []
+		weights = []
+		default1 = self._default
+		default2 = other._default
+		letters1, letters2 = self._letters, other._letters
+		i = j = 0
+		while i < len(letters1) or j < len(letters2):
+			if j == len(letters2) or (i < len(letters1) and
+					letters1[i] < letters2[j]):
+				letter = letters1[i]
+				arc1 = (self._dests[i], self._weights[i])
+				arc2 = default2
+				i += 1
+			elif i == len(letters1) or letters2[j] < letters1[i]:
+				letter = letters2[j]
+				arc1 = default1
+				arc2 = (other._dests[j], other._weights[j])
+				j += 1
 			else:
-				for letter in arcset:
-					arcs[letter] = (arcset.dest, arcset.weight)
-		self._validate_arcsets(arcsets)
+				letter = letters1[i]
+				arc1 = (self._dests[i], self._weights[i])
+				arc2 = (other._dests[j], other._weights[j])
+				i += 1
+				j += 1
+			if arc1 is not None and arc2 is not None:
+				letters.append(letter)
+				dests.append(number(arc1[0], arc2[0]))
+				weights.append(arc1[1]*arc2[1])
+		default = None
+		if default1 is not None and default2 is not None:
+			default = (number(default1[0], default2[0]), default1[1]*default2[1])
+		return State(name, self._alphabet, stop_weight,
+			transitions=(letters, dests, weights), default=default)
+
+	def relabel( self, index ):
+		'''Renames this state and the destinations of its arcs according to
+		the mapping index from old names to new names.'''
+		self.name = index[self.name]
+		self._dests = tuple([index[x] for x in self._dests])
+		if self._default is not None:
+			self._default = (index[self._default[0]], self._default[1])
+
+	def reweight(self, arc_weight, stop_weight):
+		'''Gives each arc, the default arc included, the weight
+		arc_weight(dest, weight) and gives the state the stop weight
+		stop_weight. The arc tuples are replaced rather than changed, so states
+		sharing them are unaffected.'''
+		self._weights = tuple([arc_weight(dest, weight)
+			for dest, weight in izip(self._dests, self._weights)])
+		if self._default is not None:
+			dest, weight = self._default
+			self._default = (dest, arc_weight(dest, weight))
+		self._stop_weight = stop_weight
+
+	def share_row(self, tables):
+		'''Replaces this state's arc tuples and default arc with equal ones
+		already in tables, a list of four dicts used as intern tables for
+		letters, destinations, weights and default arcs, adding those that
+		aren't. States that went through the same tables and have the same arcs
+		then hold the very same tuples.'''
+		letters, dests, weights, defaults = tables
+		self._letters = letters.setdefault(self._letters, self._letters)
+		self._dests = dests.setdefault(self._dests, self._dests)
+		self._weights = weights.setdefault(self._weights, self._weights)
+		if self._default is not None:
+			self._default = defaults.setdefault(self._default, self._default)
+
+	def same_arcs(self, other):
+		'''Whether this state and other have the same arcs. This is an identity
+		check for states that share rows.'''
+		if self._letters is other._letters and self._dests is other._dests and \
+				self._weights is other._weights:
+			return self._default == other._default
+		return self._letters == other._letters and \
+			self._dests == other._dests and \
+			self._weights == other._weights and self._default == other._default
+
+	def optimal_arcs(self):
+		'''The arcs of this state grouped as they are best described: a dict
+		from labels to (dest, weight) pairs, where the label '_other' stands
+		for every letter without a label of its own. It covers the default
+		arc, or if there is none and every letter has an arc, the largest
+		group of letters sharing a destination and weight.'''
+		groups = self._arc_groups()
+		other = self._default
+		if other is None and len(self._letters) == len(self._alphabet):
+			other = max(groups, key=lambda x: len(groups[x]))
+		arcs = {}
+		if other is not None:
+			arcs['_other'] = other
+			groups.pop(other, None)
+		for arc, letters in groups.iteritems():
+			for letter in letters:
+				arcs[letter] = arc
 		return arcs
-	
+
+	def _arc_groups(self):
+		'''A dict from (dest, weight) pairs to the letters of the explicit arcs
+		with them that the default arc doesn't already describe.'''
+		groups = {}
+		for letter, dest, weight in self.explicit_arcs():
+			if (dest, weight) != self._default:
+				groups.setdefault((dest, weight), []).append(letter)
+		return groups
+
 	def _validate_arcsets(self, arcsets):
 		letters = set([])
 		for arcset in arcsets:
-			if len(arcset.letters.intersection(letters)) != 0:
-				raise IllegalState('The letter '+letter+
-									' appears in more than one ArcSet.' 
+			repeated = arcset.letters.intersection(letters)
+			if len(repeated) != 0:
+				raise IllegalState('The letter '+str(min(repeated))+
+									' appears in more than one ArcSet.'
 				)
 			letters.update(arcset.letters)
-	
+
 	def num_arcs(self):
-		if self._arcs == None:
-			return None
-		else:
-			return len(self._arcs)
-	
+		return len(self.optimal_arcs())
+
 	def complexity(self, num_states, weight_encoding, base=2):
-		if self._arcs == None:
-			return None
 		num_labels = len(self._alphabet)+1
 		state_enc = log(num_states, base)
 		labels_encoded = 0
 		tot_complexity = weight_encoding(self._stop_weight)
-		for letter, (dest, weight) in self._arcs.items():
+		for letter, (dest, weight) in self.optimal_arcs().items():
 			tot_complexity += 2*state_enc+weight_encoding(weight)
 			tot_complexity += log(num_labels-labels_encoded, base)
 			labels_encoded += 1
 		return tot_complexity
 
-	def prune_transitions(self, dest):
-		arc_removed = False
-		for label in self._transitions:
-			if self._transitions[label][0] == dest:
-				self._transitions.pop(label)
-				arc_removed = True
-				if self._arcs is not None:
-					self._arcs.pop(label)
-		if arc_removed and self._arcs is not None and '_other' in self._arcs:
-			self._arcs.pop('_other')
-			for letter in self._alphabet.difference(set(self._arcs.keys())):
-				self._arcs[letter] = self.__transitions[letter]
-	
+	def prune_transitions(self, dests):
+		'''Removes the arcs leading to any state in dests.'''
+		kept = [i for i, dest in enumerate(self._dests) if dest not in dests]
+		if len(kept) < len(self._dests):
+			self._letters = tuple([self._letters[i] for i in kept])
+			self._dests = tuple([self._dests[i] for i in kept])
+			self._weights = tuple([self._weights[i] for i in kept])
+		if self._default is not None and self._default[0] in dests:
+			self._default = None
+
 	def normalize(self):
-		total = sum([x[1] for x in self.__transitions.values()])
-		total += self._stop_weight
-
-		trans = {}
-		for letter, (dest, weight) in self.__transitions.items():
-			trans[letter] = (dest, weight/total)
-		return State(self.name, self._alphabet, 
-				self._stop_weight/total, transitions=trans)
-	
+		total = sum(self._weights, self._stop_weight)
+		if self._default is not None:
+			uncovered = len(self._alphabet) - len(
+				[x for x in self._letters if x in self._alphabet])
+			for i in range(uncovered):
+				total += self._default[1]
+
+		default = self._default
+		if default is not None:
+			default = (default[0], default[1]/total)
+		return State(self.name, self._alphabet, self._stop_weight/total,
+				transitions=(self._letters, self._dests,
+					[x/total for x in self._weights]), default=default)
+
 	def change_semiring(self, change):
-		transitions = {}
-		for letter, (dest, weight) in self._transitions.items():
-			transitions[letter] = (dest, change(weight))
+		default = self._default
+		if default is not None:
+			default = (default[0], change(default[1]))
 		return State(self.name, self._alphabet, change(self._stop_weight),
-			transitions=transitions)
-	
+			transitions=(self._letters, self._dests,
+				[change(x) for x in self._weights]), default=default)
+
 
 class ParametrizedState(State):
 	'''
 	A State whose arc weights can be tied and edited dynamically.
-	
+
 	>>> from semiring import Tropical
 	>>> alphabet = set('abcdef')
 	>>> trans1 = {'a': ('1', Tropical(3.0)), 'b':('1', Tropical(2.0)),
-	... 'c':('2',Tropical(3.0)), 'd':('3',Tropical(2.0)), 
+	... 'c':('2',Tropical(3.0)), 'd':('3',Tropical(2.0)),
 	... 'e':('1',Tropical(3.0)), 'f':('2',Tropical(1.0)) }
 	>>> trans_map1 = [set('f'), set('db'), set('ace')]
 	>>> trans2 = {'a': ('2', Tropical(4.0)), 'b':('1', Tropical(3.0)),
@@ -187,7 +388,7 @@ class ParametrizedState(State):
 	('1', 5.0 in a tropical semiring.)
 	>>> state2.stop()
 	5.0 in a tropical semiring.
-	>>> state3 = state1.combine(state2)
+	>>> state3 = state1.combine(state2, 0, lambda x, y: x + '%' + y)
 	>>> state3.transition('f')
 	('2%2', 5.0 in a tropical semiring.)
 	>>> state3.change_parameter(4, Tropical(8.0), Tropical(4.0))
@@ -200,52 +401,112 @@ class ParametrizedState(State):
 	8.0 in a tropical semiring.
 	>>> state3.transition('b')[1]
 	5.0 in a tropical semiring.
+	>>> sorted(state3.parameters_used())
+	[0, 1, 2, 3, 4]
 	'''
+	__slots__ = ('_parameter_map', '_num_params')
+
 	def __init__(self, name, alphabet, stop_weight, parameter_map,
-			arcsets=None, transitions=None):
+			arcsets=None, transitions=None, default=None, num_params=None):
 		'''
-		All parameters but parameter_map function exactly as in State.
+		All parameters but parameter_map and num_params function exactly as in
+		State.
 		parameter_map is a list of collections of transitions whose weights are tied
 			to the parameter at that collection's index. The special transition label
-			"_stop" indicates the stopping weight for this state is tied to the 
-			indexed parameter.
+			"_stop" indicates the stopping weight for this state is tied to the
+			indexed parameter, and "_other" ties the default arc. It may also be a
+			dict from parameter indices to collections, leaving out the parameters
+			this state doesn't use, in which case num_params must be given.
+		num_params: the number of parameters of the machine this state is in.
+
+		Only the parameters the state uses are stored, so a product state
+		doesn't hold an entry for every parameter of every machine in an
+		intersection chain.
 		'''
-		State.__init__(self, name, alphabet, stop_weight, arcsets, transitions)
-		self._parameter_map = parameter_map
-		
+		State.__init__(self, name, alphabet, stop_weight, arcsets, transitions,
+			default)
+		if isinstance(parameter_map, dict):
+			self._parameter_map = dict([(i, set(x))
+				for i, x in parameter_map.iteritems() if x])
+		else:
+			num_params = len(parameter_map)
+			self._parameter_map = dict([(i, set(x))
+				for i, x in enumerate(parameter_map) if x])
+		self._num_params = num_params
+
 	def uses_parameter(self, index):
-		return len(self._parameter_map[index]) > 0
-		
+		return index in self._parameter_map
+
+	def parameters_used(self):
+		'''Iterates over the indices of the parameters tied to this state.'''
+		return self._parameter_map.iterkeys()
+
 	def change_parameter(self, index, value, old_value):
-		for transition in self._parameter_map[index]:
+		#the weights tuple may be shared with other states, so the new
+		#weights go in a copy made once for all the tied letters
+		weights = list(self._weights)
+		for transition in self._parameter_map.get(index, ()):
 			if transition == '_stop':
 				self._stop_weight /= old_value
 				self._stop_weight *= value
+			elif transition == '_other':
+				dest, weight = self._default
+				self._default = (dest, weight*value/old_value)
 			else:
-				try:
-					self._transitions[transition] = \
-						(
-							self._transitions[transition][0], 
-							self._transitions[transition][1]*value/old_value
-						)
-				except:
-					print self.name
-	
-	def combine( self, other ):
-		state = State.combine(self, other)
-		new_param_map = []
-		new_param_map.extend(self._parameter_map)
-		new_param_map.extend(other._parameter_map)
+				#a tied letter whose arc was pruned has nothing to reweight
+				i = self._find(transition)
+				if i >= 0:
+					weights[i] = weights[i]*value/old_value
+		self._weights = tuple(weights)
+
+	def combine( self, other, name, number, labels=None ):
+		#other's parameters follow this machine's in the product
+		state = State.combine(self, other, name, number, labels)
+		new_param_map = self.__tied_labels(state, lambda x: x, 0)
+		new_param_map.update(other.__tied_labels(state,
+			(lambda x: x) if labels is None else labels.get, self._num_params))
 		return ParametrizedState(state.name, self._alphabet, state.stop(),
-				new_param_map, transitions=state._transitions)
-	
-	def prune_transitions(self, dest):
-		State.prune_transitions(self, dest)
-		for param_point in self._parameter_map:
+				new_param_map, transitions=(state._letters, state._dests,
+					state._weights), default=state.default(),
+				num_params=self._num_params + other._num_params)
+
+	def __tied_labels( self, product, label_of, offset ):
+		'''This state's parameter map, relabeled for a product state it is a
+		component of, with offset added to the parameter indices. label_of maps
+		the product's labels to this state's. Arcs of the product that used
+		this state's default arc are tied wherever '_other' is.'''
+		uses = {}
+		for letter in product._letters:
+			label = label_of(letter)
+			if self._find(label) < 0:
+				label = '_other'
+			uses.setdefault(label, []).append(letter)
+		if product.default() is not None:
+			uses.setdefault('_other', []).append('_other')
+		param_map = {}
+		for index, param_point in self._parameter_map.iteritems():
+			tied = set([])
+			for label in param_point:
+				if label == '_stop':
+					tied.add(label)
+				else:
+					tied.update(uses.get(label, ()))
+			if tied:
+				param_map[index + offset] = tied
+		return param_map
+
+	def prune_transitions(self, dests):
+		State.prune_transitions(self, dests)
+		for index, param_point in self._parameter_map.items():
 			for label in frozenset(param_point):
-				if label != '_stop' and self.transition(label)[0] is None:
+				if label == '_other':
+					if self._default is None:
+						param_point.remove(label)
+				elif label != '_stop' and self._find(label) < 0:
 					param_point.remove(label)
-	
+			if not param_point:
+				del self._parameter_map[index]
+
 class NaturalClassState(ParametrizedState):
 	'''
 	>>> from nat_class_set import NaturalClassSet
@@ -263,73 +524,79 @@ class NaturalClassState(ParametrizedState):
 	('2', 3.0 in a tropical semiring.)
 	>>> state.transition('p')
 	('1', 0.0 in a tropical semiring.)
-	>>> len(state._arcs)
+	>>> arcs = state.optimal_arcs()
+	>>> len(arcs)
 	6
-	>>> state._arcs['_other']
+	>>> arcs['_other']
 	('1', 0.0 in a tropical semiring.)
-	>>> state._arcs[stop]
+	>>> arcs[stop]
 	('2', 3.0 in a tropical semiring.)
-	>>> state._arcs[nasal]
+	>>> arcs[nasal]
 	('2', 3.0 in a tropical semiring.)
-	>>> state._arcs[frozenset('z')]
+	>>> arcs[frozenset('z')]
 	('2', 3.0 in a tropical semiring.)
-	>>> state._arcs[frozenset('l')]
+	>>> arcs[frozenset('l')]
 	('2', 3.0 in a tropical semiring.)
-	>>> state._arcs[frozenset('r')]
+	>>> arcs[frozenset('r')]
 	('2', 3.0 in a tropical semiring.)
 	'''
-	def __init__(self, name, nat_class_set, stop_weight, parameter_map, 
+	__slots__ = ('nat_class_set',)
+
+	def __init__(self, name, nat_class_set, stop_weight, parameter_map,
 					arcsets=None, transitions=None):
 		self.nat_class_set = nat_class_set
-		ParametrizedState.__init__(self, name, nat_class_set.alphabet, 
+		ParametrizedState.__init__(self, name, nat_class_set.alphabet,
 									stop_weight, parameter_map, arcsets,
 									transitions)
-	
+
 	def complexity(self, num_states, weight_encoding, base=2):
-		if self._arcs == None:
-			return None
 		state_enc = log(num_states, base)
-		param_enc = log(len(self._parameter_map)+1, base)
+		param_enc = log(self._num_params+1, base)
 		labels_size_left = self.nat_class_set.labels_len
 		tot_complexity = param_enc
-		for label, (dest, weight) in self._arcs.items():
+		for label, (dest, weight) in self.optimal_arcs().items():
 			tot_complexity += 2*state_enc+param_enc
-			tot_complexity += log(len(label)/labes_size_left, base)
+			tot_complexity += log(len(label)/labels_size_left, base)
 			labels_size_left -= len(label)
 		return tot_complexity
 
-	
-	def _optimal_arcs(self, arcsets):
+
+	def optimal_arcs(self):
+		'''As State.optimal_arcs, with the letters of each group covered by
+		natural classes. '_other' stands for the group whose covering labels
+		are least likely to be drawn at random.'''
 		norm = float(self.nat_class_set.labels_len)
-		lowest_prob = 1.0
-		lowest_arcset = None
-		letters_covered = frozenset([])
-		for arcset in arcsets:
-			letters_covered = letters_covered.union(arcset.letters)
-			curr_prob = 1.0
-			for label in arcset.labels:
-				curr_prob *= len(label)/norm
-			if curr_prob < lowest_prob:
-				lowest_prob = curr_prob
-				lowest_arcset = arcset
+		groups = {}
+		for arc, letters in self._arc_groups().iteritems():
+			groups[arc] = _get_covering_labels(frozenset(letters),
+				self.nat_class_set.classes)
+		other = self._default
+		if other is None and len(self._letters) == len(self._alphabet):
+			lowest_prob = 1.0
+			for arc, labels in groups.iteritems():
+				curr_prob = 1.0
+				for label in labels:
+					curr_prob *= len(label)/norm
+				if curr_prob < lowest_prob:
+					lowest_prob = curr_prob
+					other = arc
 		arcs = {}
-		for arcset in arcsets:
-			if arcset is lowest_arcset and letters_covered == self._alphabet:
-				arcs['_other'] = (arcset.dest, arcset.weight)
-			else:
-				for label in arcset.labels:
-					arcs[label] = (arcset.dest, arcset.weight)
-		self._validate_arcsets(arcsets)
+		if other is not None:
+			arcs['_other'] = other
+			groups.pop(other, None)
+		for arc, labels in groups.iteritems():
+			for label in labels:
+				arcs[label] = arc
 		return arcs
-			
+
 
 class IllegalState(Exception):
 	def __init__(self, message):
 		self.message = message
-	
+
 	def __str__(self):
 		return self.message
-	
+
 
 if __name__ == '__main__':
 	import doctest
@@ -0,0 +1,109 @@
+from array import array
+import weakref
+
+class SymbolTable( object ):
+	'''
+	Numbers the symbols of an alphabet 0, 1, ... so that machines can label
+	their arcs with small ints. A symbol may be several characters long; words
+	given as strings are split into as few unknown symbols as possible,
+	preferring longer symbols first. Words may also be given as sequences of
+	symbols.
+
+	>>> table = SymbolTable(['a', 'i', 't', 'ts', 'sh'])
+	>>> table.split('tsatshi')
+	['ts', 'a', 't', 'sh', 'i']
+	>>> list(table.encode('tsatshi'))
+	[4, 0, 3, 2, 1]
+	>>> table.split('tsahi')
+	['ts', 'a', 'h', 'i']
+	>>> table.decode(table.encode(['t', 'sh', 'a']))
+	'tsha'
+	>>> SymbolTable.for_alphabet('abc') is SymbolTable.for_alphabet(set('cba'))
+	True
+	'''
+	__shared = weakref.WeakValueDictionary()
+
+	def __init__( self, symbols = () ):
+		self.symbols = []
+		self.__ids = {}
+		self.__longest = 1
+		for symbol in sorted(symbols):
+			self.add(symbol)
+
+	@classmethod
+	def for_alphabet( cls, alphabet ):
+		'''The SymbolTable shared by every machine over this alphabet, for as
+		long as one of them is alive.'''
+		alphabet = frozenset(alphabet)
+		table = cls.__shared.get(alphabet)
+		if table is None:
+			table = cls(alphabet)
+			cls.__shared[alphabet] = table
+		return table
+
+	def add( self, symbol ):
+		'''Numbers symbol if it isn't already, and returns its number.'''
+		if symbol not in self.__ids:
+			self.__ids[symbol] = len(self.symbols)
+			self.symbols.append(symbol)
+			self.__longest = max(self.__longest, len(symbol))
+		return self.__ids[symbol]
+
+	def __getitem__( self, symbol ):
+		return self.__ids[symbol]
+
+	def get( self, symbol, default = -1 ):
+		return self.__ids.get(symbol, default)
+
+	def __contains__( self, symbol ):
+		return symbol in self.__ids
+
+	def __iter__( self ):
+		return iter(self.symbols)
+
+	def __len__( self ):
+		return len(self.symbols)
+
+	def symbol( self, number ):
+		return self.symbols[number]
+
+	def split( self, word ):
+		'''The list of symbols in word. Of the ways to split a string into
+		symbols, with characters that aren't symbols standing alone, this is
+		the one with the fewest unknown symbols, taking the longest symbol
+		at each point where that doesn't cost an unknown symbol later.'''
+		if not isinstance(word, basestring) or self.__longest == 1:
+			return list(word)
+		#unknown[i] is the fewest unknown symbols word[i:] can be split into,
+		#found from the end of the word back
+		n = len(word)
+		unknown = [0]*(n + 1)
+		for start in range(n - 1, -1, -1):
+			unknown[start] = unknown[start + 1] + (word[start] not in self.__ids)
+			for length in range(2, min(self.__longest, n - start) + 1):
+				if word[start:start+length] in self.__ids:
+					unknown[start] = min(unknown[start], unknown[start + length])
+		symbols = []
+		start = 0
+		while start < n:
+			length = min(self.__longest, n - start)
+			while length > 1 and (word[start:start+length] not in self.__ids or
+					unknown[start + length] != unknown[start]):
+				length -= 1
+			symbols.append(word[start:start+length])
+			start += length
+		return symbols
+
+	def encode( self, word ):
+		'''The array of symbol numbers for word, with -1 for unknown symbols.'''
+		get = self.__ids.get
+		return array('i', [get(x, -1) for x in self.split(word)])
+
+	def decode( self, numbers ):
+		'''The string spelled by a sequence of symbol numbers.'''
+		return ''.join([self.symbols[x] for x in numbers])
+
+
+if __name__ == '__main__':
+	import doctest
+	doctest.testmod()
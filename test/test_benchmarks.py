@@ -0,0 +1,54 @@
+import unittest
+import numpy
+import fsa.wfsa as wfsa
+from fsa.benchmarks import generators, micro, macro
+
+class TestBenchmarks( unittest.TestCase ):
+	def test_random_machines(self):
+		rng = numpy.random.RandomState(3)
+		for other in [False, True]:
+			machine = generators.random_mult_wfsa(12, 5, other=other, rng=rng)
+			self.assertEqual(len(machine.state_names), 12)
+			#locally normalized, so the machine's total weight is one
+			self.assertAlmostEqual(machine.norm_constant()[0], 1.0, 5)
+			machine = generators.random_param_wfsa(12, 5, 4, other=other,
+				rng=rng)
+			self.assertEqual(len(machine.state_names), 12)
+
+	def test_untrimmed(self):
+		letters, stops, arcs = generators.random_untrimmed_arcs(12, 5,
+			rng=numpy.random.RandomState(2))
+		self.assertEqual(len(arcs), 12)
+		machine = micro._Untrimmed(letters, 0, stops, arcs)
+		self.assertEqual(len(machine._states()), 12)
+		wfsa.LogWFSA.trim(machine)
+		self.assertEqual(len(machine._states()), 6)
+
+	def test_reproducible(self):
+		first = generators.random_arcs(8, 4, rng=numpy.random.RandomState(1))
+		second = generators.random_arcs(8, 4, rng=numpy.random.RandomState(1))
+		self.assertEqual(first, second)
+
+	def test_run(self):
+		options = micro.parse_args(['--sizes', '5', '--cubic-sizes', '5',
+			'--features', '2', '--words', '10', '--repeat', '1', '--other'])
+		results = micro.run(options)
+		self.assertEqual([x['benchmark'] for x in results['results']],
+			[x[0] for x in micro.BENCHMARKS])
+		pairs = micro.compare(results, results)
+		self.assertEqual([x[-1] for x in pairs], [1.0]*len(pairs))
+
+	def test_macro(self):
+		options = macro.parse_args(['--words', '200', '--corpus', '20',
+			'--steps', '2'])
+		results = macro.run(options)
+		stages = [x['benchmark'] for x in results['results']]
+		self.assertEqual(stages[:5], ['lexicon', 'natural_classes',
+			'statistics', 'machines', 'intersect'])
+		self.assertEqual(stages[-1], 'total')
+		self.assertEqual(len(results['objective']), 2)
+		for cost in results['objective']:
+			self.assert_(0 < cost < float('inf'))
+
+if __name__ == "__main__":
+	unittest.main()
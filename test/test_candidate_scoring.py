@@ -0,0 +1,64 @@
+import unittest
+from fsa.candidate_scoring import CandidateScorer
+from fsa.nat_class_set import NaturalClassSet
+
+class TestCandidateScorer( unittest.TestCase ):
+	def setUp(self):
+		self.vowel = frozenset('aeiu')
+		self.front = frozenset('ei')
+		self.cons = frozenset('ptkbdsz')
+		self.voice = frozenset('bdz')
+		self.nat_class_set = NaturalClassSet( self.vowel.union(self.cons),
+				set([self.vowel, self.front, self.cons, self.voice]) )
+		self.corpus = ['#bapist#', 'dezuk', 'ikbaz', 'tspidu', 'a', 'zeebi']
+		self.scorer = CandidateScorer( self.nat_class_set, self.corpus )
+
+	def brute_force(self, class1, class2, tier=None):
+		count = 0
+		for word in self.corpus:
+			word = word.strip('#')
+			if tier is not None:
+				word = [x for x in word if x in tier]
+			for first, second in zip(word[:-1], word[1:]):
+				if first in class1 and second in class2:
+					count += 1
+		return count
+
+	def test_bigram_counts(self):
+		observed, expected = self.scorer.bigram_counts()
+		for class1 in self.scorer.classes:
+			for class2 in self.scorer.classes:
+				i = self.scorer.class_index(class1)
+				j = self.scorer.class_index(class2)
+				self.assertEqual(observed[i,j], self.brute_force(class1, class2))
+
+	def test_tier_counts(self):
+		observed, expected = self.scorer.tier_bigram_counts(self.vowel)
+		for class1 in self.scorer.classes:
+			for class2 in self.scorer.classes:
+				i = self.scorer.class_index(class1)
+				j = self.scorer.class_index(class2)
+				if class1.issubset(self.vowel) and class2.issubset(self.vowel):
+					self.assertEqual(observed[i,j],
+							self.brute_force(class1, class2, self.vowel))
+				else:
+					self.assertEqual(observed[i,j], 0)
+					self.assertEqual(expected[i,j], 0)
+
+	def test_expected_total(self):
+		observed, expected = self.scorer.bigram_counts()
+		singletons = [self.scorer.class_index([x]) for x in 'aeiuptkbdsz']
+		self.assertAlmostEqual(observed[singletons][:,singletons].sum(),
+				expected[singletons][:,singletons].sum())
+
+	def test_candidates(self):
+		observed, expected = self.scorer.bigram_counts()
+		ranked = self.scorer.candidates(observed, expected, 10)
+		self.assertEqual(len(ranked), 10)
+		ratios = [x[0] for x in ranked]
+		self.assertEqual(ratios, sorted(ratios))
+		ratio, class1, class2, o, e = ranked[0]
+		self.assertEqual(o, self.brute_force(class1, class2))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,191 @@
+import itertools
+import unittest
+import numpy
+import fsa.wfsa as wfsa
+from fsa.constraint_bank import ConstraintBank
+
+class TestCompiledWFSA( unittest.TestCase ):
+	def setUp(self):
+		self.stop = {'0':0.3, '1':0.2}
+		self.arcs = {
+			'$':{'a':('0',0.3), 'b':('1',0.7)},
+			'0':{'a':('0',0.5), 'b':('1', 0.2)},
+			'1':{'a':('0',0.7), 'b':('1', 0.1)}
+		}
+		self.fsa1 = wfsa.MultWFSA( 'ab', '$', self.stop, self.arcs )
+		self.words = ['ab', 'abba', 'b', 'bbbbaa', 'aaaaaaab', '#ab#']
+
+		self.count_c = wfsa.LogWFSA( 'abc', '0', {'0':0.0},
+			{'0':{'c':('0', 1.0), '_other':('0', 0.0)}} )
+		self.count_ab = wfsa.LogWFSA( 'abc', '0', {'0':0.0, '1':0.0},
+			{
+				'0':{'a':('1', 0.0), '_other':('0', 0.0)},
+				'1':{'a':('1', 0.0), 'b':('0', 1.0), '_other':('0', 0.0)}
+			})
+		self.no_final_b = wfsa.LogWFSA( 'ab', '0', {'0':0.0, '1':1.0},
+			{'0':{'a':('0', 0.0), 'b':('1', 0.0)},'1':{'a':('0', 0.0), 'b':('1', 0.0)}})
+
+	def test_weights(self):
+		compiled = self.fsa1.compile()
+		weights = compiled.weights(self.words)
+		for word, weight in zip(self.words, weights):
+			self.assertAlmostEqual(float(self.fsa1.weight(word)), weight)
+			self.assertAlmostEqual(compiled.weight(word), weight)
+
+	def test_unknown_letter(self):
+		compiled = self.fsa1.compile()
+		self.assertEqual(compiled.weight('abc'), 0.0)
+
+	def test_cursor(self):
+		for machine in [self.fsa1, self.count_ab]:
+			compiled = machine.compile(partition=True)
+			for word in ['abba', 'bcab', 'aab', 'a']:
+				cursor = compiled.cursor()
+				for i, letter in enumerate(word):
+					prefix = cursor.fork()
+					cursor.advance(letter)
+					self.assertAlmostEqual(prefix.stop_cost(),
+						float(machine.weight(word[:i])))
+				self.assertAlmostEqual(cursor.stop_cost(),
+					float(machine.weight(word)))
+
+	def test_sample(self):
+		rng = numpy.random.RandomState(12)
+		words = self.fsa1.sample(20000, rng)
+		self.assertEqual(len(words), 20000)
+		self.assertAlmostEqual(words.count('')/20000.0, 0.0, 2)
+		self.assertAlmostEqual(words.count('a')/20000.0,
+				float(self.fsa1.weight('a')), 2)
+		self.assertAlmostEqual(words.count('ba')/20000.0,
+				float(self.fsa1.weight('ba')), 2)
+
+	def test_sample_unnormalized(self):
+		arcs = {
+			'$':{'a':('0',0.6), 'b':('1',1.4)},
+			'0':{'a':('0',0.5), 'b':('1', 0.2)},
+			'1':{'a':('0',0.7), 'b':('1', 0.1)}
+		}
+		machine = wfsa.MultWFSA( 'ab', '$', self.stop, arcs )
+		norm = machine.norm_constant()[0]
+		words = machine.sample(20000, numpy.random.RandomState(3))
+		self.assertAlmostEqual(words.count('b')/20000.0,
+				float(machine.weight('b'))/norm, 2)
+		self.assertAlmostEqual(words.count('ab')/20000.0,
+				float(machine.weight('ab'))/norm, 2)
+
+	def test_entropy(self):
+		#a single state machine: word lengths are geometric
+		geometric = wfsa.MultWFSA('ab', '0', {'0':0.5},
+			{'0':{'a':('0', 0.25), 'b':('0', 0.25)}})
+		self.assertAlmostEqual(geometric.expected_length(), 1.0)
+		self.assertAlmostEqual(geometric.entropy(), 3.0)
+		self.assertAlmostEqual(geometric.cross_entropy(geometric), 3.0)
+
+		#against sums over every word of up to 14 letters
+		short = wfsa.MultWFSA('ab', '$', {'$':0.5, '0':0.6, '1':0.5}, {
+			'$':{'a':('0', 0.2), 'b':('1', 0.3)},
+			'0':{'a':('0', 0.3), 'b':('1', 0.1)},
+			'1':{'a':('0', 0.2), 'b':('1', 0.3)}})
+		words = [''.join(x) for n in range(15)
+			for x in itertools.product('ab', repeat=n)]
+		p = short.compile().weights(words)
+		p = p/short.norm_constant()[0]
+		reference = wfsa.MultWFSA('ab', '$', dict(self.stop, **{'$':0.1}),
+			self.arcs)
+		q = reference.compile().weights(words)
+		q = q/reference.norm_constant()[0]
+		lengths = numpy.array([len(x) for x in words])
+		for machine in [short.compile(), short.compile(partition=True)]:
+			self.assertAlmostEqual(machine.entropy(), -numpy.dot(p, numpy.log2(p)),
+				places=3)
+			self.assertAlmostEqual(machine.expected_length(),
+				numpy.dot(p, lengths), places=3)
+			self.assertAlmostEqual(machine.cross_entropy(reference),
+				-numpy.dot(p, numpy.log2(q)), places=3)
+		self.assertAlmostEqual(self.fsa1.cross_entropy(self.fsa1),
+			self.fsa1.entropy())
+
+		only_a = wfsa.MultWFSA('ab', '0', {'0':0.5}, {'0':{'a':('0', 0.5)}})
+		self.assertEqual(short.cross_entropy(only_a), float('inf'))
+		self.assertTrue(numpy.isfinite(only_a.cross_entropy(short)))
+		self.assertEqual(short.cross_entropy(self.fsa1), float('inf'))
+
+	def test_k_best(self):
+		machine = wfsa.LogWFSA( 'abc', '0', {'0':2.0, '1':0.5},
+			{
+				'0':{'a':('1', 1.0), 'b':('0', 0.25), 'c':('0', 3.0)},
+				'1':{'a':('1', 2.0), 'b':('0', -0.5), 'c':('1', 0.75)}
+			})
+		#words longer than 6 letters cost at least 3.0, so they can't
+		#be among the 25 best
+		words = ['']
+		for length in range(9):
+			words.extend([x+y for x in words if len(x) == length for y in 'abc'])
+		costs = sorted([float(machine.weight(x)) for x in words])
+		best = machine.k_best(25)
+		self.assertEqual(len(best), 25)
+		self.assert_(best[-1][1] < 3.0)
+		for (word, cost), expected in zip(best, costs):
+			self.assertAlmostEqual(cost, expected)
+			self.assertAlmostEqual(float(machine.weight(word)), cost)
+		self.assertEqual(machine.best_path(), best[0])
+
+	def test_partition(self):
+		classes = self.count_ab.letter_classes()
+		self.assertEqual(len(set(classes)), 3)
+		self.assertEqual(len(set(self.count_c.letter_classes())), 2)
+		words = ['abcab', 'cc', 'aab', 'abab', 'cabb', 'dab']
+		for machine in [self.count_c, self.count_ab, self.fsa1]:
+			compiled = machine.compile()
+			partitioned = machine.compile(partition=True)
+			self.assert_(partitioned.dest.shape[1] <= compiled.dest.shape[1])
+			for word, weight in zip(words, partitioned.weights(words)):
+				self.assertAlmostEqual(compiled.weight(word), weight)
+		machine = wfsa.MultWFSA( 'abcd', '$', self.stop,
+			{'$':{'a':('0',0.3), '_other':('1',0.7)},
+			'0':{'a':('0',0.5), 'b':('1', 0.2)},
+			'1':{'a':('0',0.7), '_other':('1', 0.05)}} )
+		partitioned = machine.compile(partition=True)
+		self.assertEqual(partitioned.dest.shape[1], 5)
+		self.assertAlmostEqual(partitioned.backward()[0],
+			machine.compile().backward()[0])
+		words = partitioned.sample(20000, numpy.random.RandomState(5))
+		self.assertAlmostEqual(words.count('c')/20000.0,
+			float(machine.weight('c'))/machine.norm_constant()[0], 2)
+
+	def test_quantized(self):
+		arcs = lambda: dict([(x, dict([(y, (z, -numpy.log2(w)))
+				for y, (z, w) in out.items()])) for x, out in self.arcs.items()])
+		machine = wfsa.LogWFSA( 'ab', '$', {'0':0.5, '1':0.25}, arcs(),
+			precision=True, m=4, e=3 )
+		self.assertRaises(wfsa.WFSAOverflowError, wfsa.LogWFSA, 'ab', '0',
+			{'0':0.0}, {'0':{'a':('0', 300.0)}}, precision=True, m=4, e=3)
+		plain = wfsa.LogWFSA( 'ab', '$', {'0':0.5, '1':0.25}, arcs() )
+		quantized = plain.compile().quantized(4, 3)
+		compiled = machine.compile()
+		self.assert_(numpy.array_equal(quantized.arc_weights, compiled.arc_weights))
+		for arcset_weight in compiled.arc_weights.ravel():
+			self.assertEqual(machine.round(arcset_weight), arcset_weight)
+		packed = machine.compile().pack()
+		self.assert_(packed.arc_weights.nbytes < compiled.arc_weights.nbytes)
+		self.assert_(numpy.array_equal(packed.weights(self.words),
+			compiled.weights(self.words)))
+		packed = machine.compile().pack(codes=False)
+		self.assert_(numpy.allclose(packed.weights(self.words),
+			compiled.weights(self.words)))
+
+	def test_bank(self):
+		constraints = [self.count_c, self.count_ab, self.no_final_b]
+		words = ['abcab', 'cc', 'aab', 'abab', 'cabb']
+		bank = ConstraintBank(constraints)
+		violations = bank.violations(words)
+		self.assertEqual(violations.shape, (len(words), len(constraints)))
+		for i, word in enumerate(words):
+			for j, constraint in enumerate(constraints):
+				self.assertAlmostEqual(violations[i,j], float(constraint.weight(word)))
+
+	def test_bank_semirings(self):
+		self.assertRaises(ValueError, ConstraintBank, [self.count_c, self.fsa1])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import fsa.wfsa as wfsa
+import fsa.instrument as instrument
+from fsa.semiring import Probability
+
+class TestInstrument( unittest.TestCase ):
+	def setUp(self):
+		self.stop = {'0':0.3, '1':0.2}
+		self.arcs = {
+			'$':{'a':('0',0.3), 'b':('1',0.7)},
+			'0':{'a':('0',0.5), 'b':('1', 0.2)},
+			'1':{'a':('0',0.7), 'b':('1', 0.1)}
+		}
+		self.fsa1 = wfsa.MultWFSA( 'ab', '$', self.stop, self.arcs )
+
+	def test_recording(self):
+		with instrument.recording() as stats:
+			self.fsa1.weight('abab')
+			self.fsa1.weight('abc')
+			self.fsa1.norm_constant()
+			self.fsa1.intersect(self.fsa1)
+		self.assertEqual(stats['calls.weight'], 2)
+		self.assertEqual(stats['weight.rejected'], 1)
+		self.assertEqual(stats['calls.intersect'], 1)
+		self.assertEqual(stats['intersect.pairs'], 3)
+		self.assert_(stats['transitions'] >= 6)
+		self.assert_(stats['semiring_ops'] > 0)
+		self.assert_(stats['states_constructed'] >= 3)
+		self.assert_(stats['norm_constant.iterations'] > 0)
+		self.assert_(stats['norm_constant.residual'] < 1e-12)
+		self.assert_(stats['time.norm_constant'] > 0)
+		self.assert_(not instrument.is_enabled())
+		self.assert_(wfsa.WeightedFSA.__dict__['weight'].__module__ is
+			wfsa.__name__)
+		self.assert_(Probability.__dict__['__mul__'].__module__ is not
+			instrument.__name__)
+
+	def test_nested(self):
+		with instrument.recording() as outer:
+			self.fsa1.weight('ab')
+			with instrument.recording() as inner:
+				self.fsa1.weight('ba')
+			self.assertEqual(inner['calls.weight'], 1)
+			self.assert_(instrument.is_enabled())
+		self.assertEqual(outer['calls.weight'], 2)
+		with instrument.recording() as stats:
+			self.fsa1.trim()
+		self.assertEqual(stats.get('states_trimmed', 0), 0)
+
+	def test_unconverged_norm(self):
+		self.arcs['0']['a'] = ('0', 0.9)
+		machine = wfsa.MultWFSA( 'ab', '$', self.stop, self.arcs )
+		with instrument.recording() as stats:
+			norm, converged = machine.norm_constant(max_iterations=5)
+		self.assert_(not converged)
+		self.assert_(norm > 0)
+		self.assertEqual(stats['norm_constant.iterations'], 5)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import fsa.wfsa as wfsa
+from fsa.symbol_table import SymbolTable
 from math import log, ceil
 from fsa.semiring import *
 
@@ -59,6 +60,72 @@ class TestMultFSA( unittest.TestCase ):
 			self.assertAlmostEquals( float(intersect.stop_weight(state)), 
 					float(stops[state]) )
 	
+	def test_intersect_chain(self):
+		chain = self.fsa1.intersect(self.fsa2).intersect(self.fsa1)
+		self.assertEqual(chain.start[0], '$%$%$')
+		self.assertEqual(len(chain.state_names), len(chain._states()))
+		for state in chain.state_names:
+			self.assertEqual(chain.state_name(chain.state_id(state)), state)
+		for word in ['ab', 'bba', 'abab']:
+			self.assertAlmostEqual(float(chain.weight(word)),
+				float(self.fsa1.weight(word))**2*float(self.fsa2.weight(word)))
+	
+	def test_intersect_symbols(self):
+		intersect = self.other.intersect(self.fsa1)
+		self.assert_(intersect.symbols is self.other.symbols)
+		self.assertAlmostEqual(float(intersect.weight('ab')),
+			float(self.fsa1.weight('ab'))**2)
+		self.assertEqual(float(intersect.weight('cab')), 0.0)
+
+	def test_default_arcs(self):
+		other2 = wfsa.MultWFSA( 'pernicious ab', '$', self.stop, self.arcs2 )
+		intersect = self.other.intersect(self.other)
+		for state in intersect._states():
+			self.assertEqual(len(list(state.explicit_arcs())), 2)
+		self.assertAlmostEqual(float(intersect.weight('bca')), 0.063**2)
+		compiled = intersect.compile()
+		for word in ['bca', 'pab', 'nab', 'ab']:
+			self.assertAlmostEqual(compiled.weight(word),
+				float(intersect.weight(word)))
+		intersect = self.other.intersect(other2)
+		self.assertEqual(float(intersect.weight('bca')), 0.0)
+		self.assertAlmostEqual(float(intersect.weight('ab')),
+			float(self.fsa1.weight('ab'))*float(self.fsa2.weight('ab')))
+
+	def test_shared_rows(self):
+		self.arcs['1'] = dict(self.arcs['0'])
+		machine = wfsa.MultWFSA('ab', '$', self.stop, self.arcs)
+		state0, state1 = [machine._states()[machine.state_id(x)] for x in '01']
+		self.assert_(state0._dests is state1._dests)
+		self.assert_(state0.same_arcs(state1))
+		self.assert_(not state0.same_arcs(machine._states()[0]))
+
+	def test_memory_report(self):
+		estimate = self.other.intersect_estimate(self.fsa2)
+		intersect = self.other.intersect(self.fsa2)
+		self.assert_(estimate['states'] >= len(intersect.state_names))
+		self.assert_(estimate['arcs'] >= sum([len(list(x.explicit_arcs()))
+			for x in intersect._states()]))
+		report = intersect.memory_report()
+		self.assert_(estimate['bytes'] >= report['total'] - report['alphabet'])
+		self.assertEqual(report['parameters'], 0)
+		self.assertEqual(report['total'],
+			sum([report[x] for x in report if x != 'total']))
+
+	def test_multichar_symbols(self):
+		machine = wfsa.MultWFSA( ['a', 't', 's', 'ts'], '$', {'$':0.5},
+			{'$':{'ts':('$', 0.1), 't':('$', 0.2), '_other':('$', 0.3)}} )
+		self.assertAlmostEqual(float(machine.weight('tsa')), 0.015)
+		self.assertAlmostEqual(float(machine.weight(['t', 's', 'a'])), 0.009)
+
+	def test_symbol_segmentation(self):
+		#greedy splitting would read ts+h here, but h is no symbol
+		table = SymbolTable(['a', 'i', 't', 's', 'ts', 'sh'])
+		self.assertEqual(table.split('tsatshi'), ['ts', 'a', 't', 'sh', 'i'])
+		self.assertEqual(list(table.encode('tsatshi')), [5, 0, 4, 3, 1])
+		self.assertEqual(table.split('tsats'), ['ts', 'a', 'ts'])
+		self.assertEqual(list(table.encode('tsahi')), [5, 0, -1, 1])
+	
 	def test_norm(self):
 		self.assertAlmostEqual(self.fsa1.norm_constant()[0], 1.0)
 		new = (self.arcs['0']['b'][0], self.arcs['0']['b'][1]+0.1)
@@ -102,6 +169,17 @@ class TestMultFSA( unittest.TestCase ):
 		fsa3 = wfsa.MultWFSA( self.fsa1.alphabet, self.fsa1.start[0], self.stop, 
 			self.arcs, zero = True )
 		self.assert_( fsa3.complexity, self.fsa1.complexity )
+
+	def test_lazy_complexity(self):
+		self.assertEqual(self.fsa2._complexity_value, None)
+		complexity = self.fsa2.complexity
+		self.assertEqual(self.fsa2._complexity_value, complexity)
+		intersect = self.fsa1.intersect(self.fsa2)
+		self.assertAlmostEqual(intersect.complexity,
+			self.fsa1.complexity + complexity)
+		intersect.trim()
+		self.assertAlmostEqual(intersect.complexity,
+			self.fsa1.complexity + complexity)
 	
 	def test_int_code(self):
 		self.assertAlmostEquals(wfsa.integer_code_len(3), 3.767978574539)
@@ -143,5 +221,21 @@ class TestMultFSA( unittest.TestCase ):
 		self.assertAlmostEqual( float(self.fsa1.weight('ab')), float(ab_weight) )
 		self.assertAlmostEqual( float(self.fsa1.weight('abaaab')), float(abaaab_weight) )
 
+	def test_push_default_arcs(self):
+		machine = wfsa.MultWFSA( 'abc', '$', {'$':0.2, '0':0.3}, {
+			'$':{'a':('0', 0.3), '_other':('$', 0.2)},
+			'0':{'b':('$', 0.1), '_other':('0', 0.2)}} )
+		words = ['', 'cab', 'bca', 'acccbb']
+		weights = [float(machine.weight(x)) for x in words]
+		complexity = machine.complexity
+		machine.push_weight()
+		for state in machine._states():
+			self.assertEqual(len(list(state.explicit_arcs())), 1)
+			self.assert_(state.default() is not None)
+		self.assertEqual(machine._complexity_value, None)
+		self.assertAlmostEqual(machine.complexity, complexity)
+		for word, weight in zip(words, weights):
+			self.assertAlmostEqual(float(machine.weight(word)), weight)
+
 if __name__ == "__main__":
 	unittest.main()
@@ -0,0 +1,77 @@
+import itertools
+import unittest
+import numpy
+import fsa.param_wfsa as param_wfsa
+from fsa.arc_set import ArcSet
+from fsa.param_search import ParameterSearch
+
+def two_letters( weight_a ):
+	'''A one state machine with parameters for the arcs on a and b and for
+	stopping.'''
+	states = param_wfsa.parametrized_states('ab',
+		[ArcSet('$', '$', 'a', 0), ArcSet('$', '$', 'b', 1)], {'$':2},
+		[weight_a, 2.0, 1.0])
+	return param_wfsa.ParametrizedWFSA('ab', '$', states, [weight_a, 2.0, 1.0])
+
+def one_letter():
+	'''A one state machine with parameters for the arc on a and for
+	stopping.'''
+	states = param_wfsa.parametrized_states('a', [ArcSet('$', '$', 'a', 0)],
+		{'$':1}, [1.0, 1.0])
+	return param_wfsa.ParametrizedWFSA('a', '$', states, [1.0, 1.0])
+
+def broken():
+	raise ValueError('No machine.')
+
+class TestParamSearch( unittest.TestCase ):
+	def setUp(self):
+		#a's are three times as common as b's and words average four letters,
+		#so the maximum likelihood weights are -log2 of 0.6, 0.2 and 0.2
+		self.corpus = ['aaab', 'aaab', 'abaa', 'baaa', 'aaba']
+		self.best = -numpy.log2([0.6, 0.2, 0.2])
+
+	def check(self, search):
+		scores = search.evaluate([self.best, [1.0, 1.0, 1.0], [1.0, 2.0, 3.0]])
+		self.assertEqual(scores[1], float('inf'))
+		self.assert_(scores[0] < scores[2])
+		machine = two_letters(1.0)
+		for index, value in enumerate(self.best):
+			machine.set_parameter(index, value)
+		self.assertAlmostEqual(scores[0],
+			sum([float(machine.weight(x)) for x in self.corpus]))
+
+		axes = [numpy.linspace(0.5, 1.0, 6), [2.0, 2.5], [2.0, 2.5]]
+		vector, score = search.grid(axes)
+		everything = search.evaluate(list(itertools.product(*axes)))
+		self.assertEqual(score, everything.min())
+		self.assertEqual(search.evaluate([vector])[0], score)
+
+		vector, score = search.random_restarts(6, 0.5, 4.0, steps=[-0.1, 0.1,
+			-0.01, 0.01], sweeps=30, rng=numpy.random.RandomState(2))
+		#the normalizer cancels the stop weight out, so only a and b count
+		self.assert_(numpy.abs(vector - self.best)[:2].max() < 0.05)
+		vector, swept = search.coordinate_sweep(vector, [-0.001, 0.001], 5)
+		self.assert_(swept <= score)
+
+	def test_in_process(self):
+		self.check(ParameterSearch(two_letters, (1.0,), self.corpus,
+			processes=0))
+
+	def test_separate_searches(self):
+		first = ParameterSearch(two_letters, (1.0,), self.corpus, processes=0)
+		expected = first.evaluate([self.best])
+		second = ParameterSearch(one_letter, (), ['a', 'aa'], processes=0)
+		self.assertEqual(second.num_params, 2)
+		self.assertEqual(list(first.evaluate([self.best])), list(expected))
+
+	def test_pool_error(self):
+		self.assertRaises(ValueError, ParameterSearch, broken, (),
+			self.corpus, processes=2)
+
+	def test_pool(self):
+		with ParameterSearch(two_letters, (1.0,), self.corpus, processes=2,
+				chunk=3) as search:
+			self.check(search)
+
+if __name__ == "__main__":
+	unittest.main()
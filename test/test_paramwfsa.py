@@ -1,6 +1,9 @@
+import cPickle
 import unittest
+from math import log
 import fsa.param_wfsa as fsa
 from fsa.arc_set import ArcSet
+from fsa.wfsa import integer_code_len
 from fsa.semiring import *
 
 class TestParamFSA( unittest.TestCase ):
@@ -60,6 +63,103 @@ class TestParamFSA( unittest.TestCase ):
         self.assertAlmostEquals( float(fsa3.weight('dcba')), 21 )
         fsa3.set_parameter(5, 5)
         self.assertAlmostEquals( float(fsa3.weight('dcba')), 22 )
+        for state in fsa3._states():
+            for index in state.parameters_used():
+                self.assert_(0 <= index < 6)
+                self.assert_(state.uses_parameter(index))
+
+    def test_default_parameter(self):
+        arcsets = [ArcSet('$', '$', 'a', 0), ArcSet('$', '$', ['_other'], 1)]
+        states1 = fsa.parametrized_states('abcd', arcsets, {'$':-1}, [1, 2])
+        fsa1 = fsa.ParametrizedWFSA('abcd', '$', states1, [1, 2])
+        states2 = fsa.parametrized_states('abcd', arcsets, {'$':-1}, [3, 4])
+        fsa2 = fsa.ParametrizedWFSA('abcd', '$', states2, [3, 4])
+        fsa3 = fsa1.intersect(fsa2)
+        self.assertAlmostEquals( float(fsa3.weight('abcd')), 4+18 )
+        fsa3.set_parameter(1, 5)
+        self.assertAlmostEquals( float(fsa3.weight('abcd')), 4+27 )
+        fsa3.set_parameter(2, 0)
+        self.assertAlmostEquals( float(fsa3.weight('abcd')), 1+27 )
+        self.assertAlmostEquals( float(fsa3.weight('bb')), 18 )
+
+    def test_evaluate(self):
+        machine = self.fsa1.intersect(self.fsa2)
+        words = ['acd', 'ccda', 'da', 'dcbbd']
+        vectors = [[2, 3, 10, 1, 6, 4], [5, 5, 5, 5, 5, 5],
+                [1, 0.5, 8, 2, 3, 1]]
+        costs, norms = machine.evaluate(vectors, words)
+        for vector, cost, norm in zip(vectors, costs, norms):
+            for index, value in enumerate(vector):
+                machine.set_parameter(index, value)
+            self.assertAlmostEqual(cost,
+                    sum([float(machine.weight(x)) for x in words]))
+            self.assertAlmostEqual(norm, machine.mult_wfsa().norm_constant()[0])
+        costs, norms = machine.evaluate([[0]*6], ['ab', 'cd'])
+        self.assertEqual((costs[0], norms[0]), (float('inf'), float('inf')))
+
+    def test_view(self):
+        machine = self.fsa1.intersect(self.fsa2)
+        words = ['acd', 'ccda', 'da', 'dcbbd']
+        view = machine.view(words)
+        branch = view.branch()
+        self.assert_(branch.topology is view.topology)
+        saved = view.snapshot()
+        for step in range(50):
+            view.set_parameter(step % 6, 1.0 + 0.37*step)
+        branch.set_parameter(4, 0.5)
+        for index, value in enumerate(view.parameters):
+            machine.set_parameter(index, value)
+        for word in words:
+            self.assertAlmostEqual(view.weight(word),
+                    float(machine.weight(word)))
+        self.assertAlmostEqual(view.cost(),
+                sum([float(machine.weight(x)) for x in words]))
+        self.assertAlmostEqual(view.norm_constant(),
+                machine.mult_wfsa().norm_constant()[0])
+        view.restore(saved)
+        self.assertEqual(list(view.weights(words)),
+                list(view.topology.compiled.weights(words)))
+        self.assertEqual(list(branch.parameters), [2, 3, 10, 1, 0.5, 4])
+
+    def test_memory_report(self):
+        report = self.fsa1.memory_report()
+        self.assert_(report['parameters'] > 0)
+        self.assertEqual(report['total'],
+                sum([report[x] for x in report if x != 'total']))
+
+    def test_complexity(self):
+        def complexity(states, arcs, stops, params, weight_len):
+            state_cost = log(states, 2)
+            weight_cost = log(params + 1, 2)
+            return arcs*(2*state_cost + log(5, 2) + weight_cost) + \
+                    stops*(state_cost + weight_cost) + params*weight_len + \
+                    integer_code_len(arcs) + integer_code_len(params) + \
+                    integer_code_len(states) + integer_code_len(stops)
+        #fsa1: $ has an '_other' arc and two arcs on letters, 1 has three,
+        #and 2 has an '_other' arc and one on d; only 1 and 2 stop. fsa2's
+        #state 2 has no arc on d, so its three letters are each spelled out.
+        weight_len = self.fsa1.weight_len
+        complexity1 = complexity(3, 8, 2, 3, weight_len)
+        complexity2 = complexity(3, 9, 2, 3, weight_len)
+        self.assertAlmostEqual(self.fsa1.complexity, complexity1)
+        self.assertAlmostEqual(self.fsa2.complexity, complexity2)
+        chain = self.fsa1.intersect(self.fsa2).intersect(self.fsa1)
+        self.assertAlmostEqual(chain.complexity,
+                2*complexity1 + complexity2)
+
+    def test_pickle(self):
+        intersect = self.fsa1.intersect(self.fsa2)
+        for protocol in [0, cPickle.HIGHEST_PROTOCOL]:
+            copy = cPickle.loads(cPickle.dumps(intersect, protocol))
+            self.assertEqual(copy.state_names, intersect.state_names)
+            self.assertAlmostEquals(float(copy.weight('acd')),
+                    float(intersect.weight('acd')))
+            copy.set_parameter(0, 4)
+            self.assertAlmostEquals(float(copy.weight('acd')),
+                    float(intersect.weight('acd')) + 2)
+        arcset = cPickle.loads(cPickle.dumps(self.arcset21))
+        self.assertEqual((arcset.source, arcset.dest, arcset.letters,
+                arcset.weight), ('2', '1', frozenset('abc'), 1))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+import unittest
+import fsa.wfsa as wfsa
+from fsa.precision import sweep
+
+class TestPrecision( unittest.TestCase ):
+	def setUp(self):
+		self.stop = {'0':0.5, '1':1.5}
+		self.arcs = {
+			'$':{'a':('0', 1.7), 'b':('1', 0.3)},
+			'0':{'a':('0', 0.9), 'b':('1', 2.3)},
+			'1':{'a':('0', 0.11), 'b':('1', 3.3)}
+		}
+		self.corpus = ['ab', 'abba', 'b', 'bbbbaa', 'aaaaaaab']
+
+	def test_sweep(self):
+		machine = wfsa.LogWFSA( 'ab', '$', self.stop, self.arcs )
+		settings = [(2, 3), (4, 3), (10, 5), (3, 1)]
+		results = sweep(machine, self.corpus, settings)
+		self.assertEqual(len(results), len(settings))
+		counts = machine._usage[2]
+		self.assertEqual(sweep(machine, self.corpus, settings), results)
+		self.assert_(machine._usage[2] is counts)
+		for (m, e), (m0, e0, complexity, cost) in zip(settings, results):
+			self.assertEqual((m, e), (m0, e0))
+			try:
+				built = wfsa.LogWFSA( 'ab', '$', self.stop, self.arcs,
+					precision=True, m=m, e=e )
+			except wfsa.WFSAOverflowError:
+				self.assertEqual(cost, float('inf'))
+				continue
+			self.assertAlmostEqual(complexity, built.complexity)
+			self.assertAlmostEqual(cost,
+				sum([float(built.weight(x)) for x in self.corpus]))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import fsa.wfsa as wfsa
+import fsa.param_wfsa as param_wfsa
+import fsa.scoring_service as scoring_service
+from fsa.arc_set import ArcSet
+
+class TestScoringService( unittest.TestCase ):
+	def setUp(self):
+		self.stop = {'0':0.3, '1':0.2}
+		self.arcs = {
+			'$':{'a':('0',0.3), 'b':('1',0.7)},
+			'0':{'a':('0',0.5), 'b':('1', 0.2)},
+			'1':{'a':('0',0.7), 'b':('1', 0.1)}
+		}
+		self.fsa1 = wfsa.MultWFSA( 'ab', '$', self.stop, self.arcs )
+		states = param_wfsa.parametrized_states('ab',
+			[ArcSet('$', '$', 'a', 0), ArcSet('$', '$', 'b', 1)],
+			{'$':-1}, [1.0, 2.0])
+		self.params = param_wfsa.ParametrizedWFSA('ab', '$', states, [1.0, 2.0])
+		self.words = ['ab', 'abba', 'b', 'bbbbaa', 'c', '']
+
+		self.service = scoring_service.ScoringService(max_wait=0.01)
+		self.service.add_model('mult', self.fsa1)
+		self.service.add_model('params', self.params)
+		self.directory = tempfile.mkdtemp()
+		self.servers = []
+
+	def tearDown(self):
+		for server in self.servers:
+			server.shutdown()
+			server.server_close()
+		self.service.close()
+		shutil.rmtree(self.directory)
+
+	def serve(self, address):
+		server = scoring_service.server(self.service, address)
+		thread = threading.Thread(target=server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		self.servers.append(server)
+		return server.server_address
+
+	def test_concurrent(self):
+		address = self.serve(('127.0.0.1', 0))
+		expected = [float(self.fsa1.weight(x)) for x in self.words]
+		results = {}
+		def score(number):
+			client = scoring_service.Client(address)
+			results[number] = client.score('mult', self.words)
+			client.close()
+		threads = [threading.Thread(target=score, args=(x,)) for x in range(8)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		self.assertEqual(len(results), 8)
+		for weights in results.values():
+			for weight, correct in zip(weights, expected):
+				self.assertAlmostEqual(weight, correct)
+
+	def test_hot_swap(self):
+		client = scoring_service.Client(self.serve(
+			os.path.join(self.directory, 'socket')))
+		self.assertEqual(client.models(), ['mult', 'params'])
+		self.assertEqual(client.score('params', ['aab']), [4.0])
+		client.set_parameters('params', [3.0, 0.5])
+		self.assertEqual(client.score('params', ['aab']), [6.5])
+		self.assertEqual(self.params._params, [1.0, 2.0])
+		client.set_parameters('params', [1.0, 2.0])
+		self.assertEqual(client.score('params', ['aab']), [4.0])
+		self.assertRaises(scoring_service.ScoringError, client.set_parameters,
+			'mult', [1.0])
+		self.assertRaises(scoring_service.ScoringError, client.set_parameters,
+			'params', [1.0])
+		self.assertRaises(scoring_service.ScoringError, client.score,
+			'missing', ['a'])
+		client.close()
+
+	def test_malformed(self):
+		client = scoring_service.Client(self.serve(('127.0.0.1', 0)))
+		for words in [[1], None, 'ab', [['a', 2]]]:
+			self.assertRaises(scoring_service.ScoringError, client.request,
+				{'model':'mult', 'words':words})
+		self.assertRaises(scoring_service.ScoringError, client.request,
+			{'words':['ab']})
+		self.assertRaises(scoring_service.ScoringError, client.request, [1])
+		self.assertAlmostEqual(client.score('mult', ['ab'])[0],
+			float(self.fsa1.weight('ab')))
+		self.assertRaises(TypeError, self.service.score, 'mult', [None])
+		client.close()
+
+if __name__ == "__main__":
+	unittest.main()
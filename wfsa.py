@@ -1,7 +1,12 @@
 from math import *
+from array import array
+from sys import getsizeof
 from semiring import *
 from arc_set import *
 from state import *
+from symbol_table import SymbolTable
+from precision import quantize, WFSAOverflowError
+import instrument
 
 '''The classes defined in this module are all deterministic finite state string
  to weight transducers.'''
@@ -15,12 +20,35 @@ def integer_code_len( integer, base=2 ):
 		current = log(current, base)
 	return total
 
+def _state_name(naming, state):
+	'''The name of state number state, given the naming of its machine; see
+	WeightedFSA._naming.'''
+	names, pair_keys, base, components = naming
+	if pair_keys is not None:
+		state1, state2 = divmod(pair_keys[state], base)
+		return '%s%%%s' % (_state_name(components[0], state1),
+			_state_name(components[1], state2))
+	if names is not None:
+		return names[state]
+	return state
+
 def for_each_arc(arcs, action):
 	for source in arcs:
 		for label in arcs[source]:
 			dest, weight = arcs[source][label]
 			action(source, label, dest, weight)
 
+def _bytes( objects, seen ):
+	'''The total size of the objects whose ids aren't in seen, which are then
+	added to it, so that objects shared between machines, states or rows are
+	only counted once.'''
+	total = 0
+	for x in objects:
+		if id(x) not in seen:
+			seen.add(id(x))
+			total += getsizeof(x)
+	return total
+
 class WeightedFSA(object):
 	'''A generic weighted FSA. It is:
 			0) A set of symbols, called the alphabet.
@@ -33,10 +61,18 @@ class WeightedFSA(object):
 	alt_precision = False
 	mantissa = 10
 	exp = 5
+	weight_len = 64
+	zero = False
+	#the cached description length, and whether it was assigned rather than
+	#computed from the states; see the complexity property
+	_complexity_value = None
+	_complexity_given = False
+	#the corpus, bound_strip and usage counts of the latest usage_counts call
+	_usage = None
 
 	def __init__( self, alphabet, start, semiring, start_weight,
 				stops=None, arcs=None, arcsets = None, states = None,
-				precision = None, m = None,e = None, zero = False):
+				precision = None, m = None,e = None, zero = False, symbols = None):
 		'''
 		alphabet: the charecter alphabet used for this wfsa. 
 		start: the start state. states are intended to be picked out by strings
@@ -51,33 +87,138 @@ class WeightedFSA(object):
 			stops and one of arcs or arcsets must be specified.
 		precision: boolean. If false, standard 64 bit floats are used as the arc
 		weights. Otherwise, arc weights are represented according to m and e.
+		symbols: the SymbolTable numbering the letters of the alphabet. By
+			default all machines over the same alphabet share one table.
+
+		Internally states are numbered densely from 0, the start state, and arcs
+		are labeled with the numbers self.symbols gives their letters. The
+		public methods of this class take and return the names given here;
+		state_name and state_id convert between numbers and names. States
+		passed in must already be labeled with symbol numbers.
 		'''
-		self.start = (start, semiring(start_weight))
 		self.semiring = semiring
 		self.alphabet = frozenset(alphabet)
+		if symbols is None:
+			symbols = SymbolTable.for_alphabet(self.alphabet)
+		self.symbols = symbols
+		self._labels = frozenset([symbols[x] for x in self.alphabet])
 		
 		if stops is not None:
 			if arcs is not None:
 				arcsets = self.__arcsets(arcs)
+			arcsets = [ArcSet(x.source, x.dest, [symbols[y] if y != '_other' else y
+				for y in x.letters], x.weight) for x in arcsets]
 			self._change_precision_and_semiring(arcsets, precision, zero, m, e)
+			by_source = {}
+			for arcset in arcsets:
+				by_source.setdefault(arcset.source, []).append(arcset)
 			states = []
-			for state_name in set([x.source for x in arcsets]):
+			for state_name, state_arcsets in by_source.iteritems():
 				new_state = State(
-					state_name, self.alphabet, 
+					state_name, self._labels, 
 					semiring(stops[state_name]) if state_name in stops else semiring.zero,
-					[x for x in arcsets if x.source == state_name]
+					state_arcsets
 				)
 				states.append(new_state)
 			
-		self.__states = {}
-		for state in states:
-			self.__states[state.name] = state
-		
-		self.state_names = frozenset(self.__states.keys())
+		self._names = None
+		self._pair_keys = None
+		self._pair_base = None
+		self._pair_namings = None
+		self._name_index = None
+		self.__states = self.__number_states(states, start)
+		self._start_weight = semiring(start_weight)
 		self.trim()
-		if not hasattr(self, 'complexity'):
-			self.complexity = self._complexity()
+		self._share_rows()
+
+	def _share_rows(self):
+		'''Makes states with identical arcs share one copy of them.'''
+		tables = [{}, {}, {}, {}]
+		for state in self.__states:
+			state.share_row(tables)
+
+	def __get_complexity(self):
+		if self._complexity_value is None:
+			self._complexity_value = self._complexity()
+		return self._complexity_value
+
+	def __set_complexity(self, value):
+		self._complexity_value = value
+		self._complexity_given = value is not None
+
+	complexity = property(__get_complexity, __set_complexity, doc=
+		'''The description length of the machine in bits. It is computed from
+		the states the first time it is read and cached until trimming or a
+		change of precision makes it stale. A value assigned to it, such as the
+		sum of the complexities of the machines an intersection was built
+		from, is kept as it is.''')
+
+	def _invalidate_complexity(self):
+		if not self._complexity_given:
+			self._complexity_value = None
+
+	start = property(lambda self: (self.state_name(0), self._start_weight),
+		doc='''The pair of the start state's name and the start weight.''')
+
+	state_names = property(lambda self: frozenset(self.names()),
+		doc='''The set of state names.''')
 						
+	def __number_states(self, states, start):
+		'''Renames states to 0, 1, ... with the start state first, keeping the
+		old names in self._names unless they already were those numbers.
+		Returns the list of states indexed by number.'''
+		names = [start] + sorted([x.name for x in states if x.name != start])
+		if names != range(len(names)):
+			self._names = names
+			index = dict([(name, i) for i, name in enumerate(names)])
+			for state in states:
+				state.relabel(index)
+		numbered = [None]*len(names)
+		for state in states:
+			numbered[state.name] = state
+		return numbered
+
+	def _states(self):
+		'''The list of this machine's States, indexed by state number.'''
+		return self.__states
+
+	def state_name(self, state):
+		'''The name of a state number. For a machine built by intersect, this
+		is the names of the component states it was built from joined by a
+		'%'.'''
+		return _state_name(self._naming(), state)
+
+	def names(self):
+		'''The list of state names, indexed by state number. For machines
+		built by intersect, this table is only built when asked for.'''
+		naming = self._naming()
+		return [_state_name(naming, x) for x in range(len(self.__states))]
+
+	def state_id(self, name):
+		'''The state number of the state called name. Raises KeyError if there
+		is no such state.'''
+		if self._names is None and self._pair_keys is None:
+			if name not in xrange(len(self.__states)):
+				raise KeyError(name)
+			return name
+		if self._name_index is None:
+			self._name_index = dict([(x, i) for i, x in enumerate(self.names())])
+		return self._name_index[name]
+
+	def _naming(self):
+		'''What state_name needs to name this machine's states. Trimming the
+		machine replaces the tables rather than changing them, so products
+		keep the namings of their components as they were.'''
+		return (self._names, self._pair_keys, self._pair_base,
+			self._pair_namings)
+
+	def _share_names(self, wfsa):
+		'''Gives this machine the state names of wfsa, whose states are
+		numbered the same.'''
+		self._names, self._pair_keys, self._pair_base, self._pair_namings = \
+			wfsa._naming()
+		self._name_index = None
+
 	def _change_precision_and_semiring(self, arcsets, precision, zero, m, e):
 		if precision is None:
 			precision = WeightedFSA.alt_precision		
@@ -92,12 +233,14 @@ class WeightedFSA(object):
 			self.mantissa = m
 			self.exp = e
 			self.weight_len = 1 + m + e
-			for arcset in arcsets.values():
-				arcset.weight = self.round(float(arcset.weight))
+			weights = quantize([float(x.weight) for x in arcsets], m, e)
+			for arcset, weight in zip(arcsets, weights):
+				arcset.weight = float(weight)
 		else:
 			self.weight_len = 64		
 		if zero:
 			self.weight_len += 1
+		self._invalidate_complexity()
 		
 		for arcset in arcsets:
 			arcset.weight = self.semiring(arcset.weight)
@@ -113,35 +256,65 @@ class WeightedFSA(object):
 		return ldexp(m, e)
 	
 	def transition(self, state, letter):
-		if state not in self.__states:
+		try:
+			number = self.state_id(state)
+		except KeyError:
 			return (None, self.semiring.zero)
-		ret =  self.__states[state].transition(letter)
-		if ret == (None, None):
+		dest, weight = self.__states[number].transition(self.symbols.get(letter))
+		if dest is None:
 			return (None, self.semiring.zero)
 		else:
-			return ret
+			return (self.state_name(dest), weight)
 	
 	def stop_weight(self, state_name):
-		return self.__states[state_name].stop()
+		return self.__states[self.state_id(state_name)].stop()
 	
 	def all_transitions(self):
-		for state in self.__states.values():
-			for letter in self.alphabet:
-				dest, weight = state.transition(letter)
-				if dest is not None:
-					yield (state.name, letter, dest, weight)
+		'''Iterates over the (source, letter, dest, weight) quadruples of every
+		arc in the machine, with states given by name.'''
+		symbol = self.symbols.symbol
+		naming = self._naming()
+		for source, label, dest, weight in self._arcs():
+			yield (_state_name(naming, source), symbol(label),
+				_state_name(naming, dest), weight)
+
+	def _arcs(self):
+		'''Iterates over the (source, symbol, dest, weight) quadruples of every
+		arc in the machine, with states given by number and letters by their
+		numbers in self.symbols.'''
+		for state in self.__states:
+			for symbol, dest, weight in state.arcs():
+				yield (state.name, symbol, dest, weight)
 	
-	def __remove_other_arcs(self, arcs):
-		for state in arcs:
-			dest_and_weight = arcs[state].pop('_other', None)
-			if dest_and_weight is not None:
-				out_letters = set( [x for x in arcs[state].keys()] )
-				add_letters = self.alphabet.difference(out_letters)
-				for letter in add_letters:
-					arcs[state][letter] = dest_and_weight
+	def letter_classes(self):
+		'''Partitions the symbols of self.symbols into classes of letters that
+		have the same destination and weight in every state. Returns the list
+		of class numbers indexed by symbol number, with classes numbered in
+		order of their first symbol. Symbols outside the alphabet, which have
+		no arcs, share a class.
+
+		Each state refines the partition: only the letters with an arc of
+		their own can leave their class, so the work is linear in the number
+		of explicit arcs, however large the alphabet.'''
+		classes = [0 if x in self._labels else 1 for x in range(len(self.symbols))]
+		count = 2
+		for state in self.__states:
+			split = {}
+			default = state.default()
+			for symbol, dest, weight in state.explicit_arcs():
+				if (dest, weight) == default:
+					continue
+				key = (classes[symbol], dest, weight)
+				if key not in split:
+					split[key] = count
+					count += 1
+				classes[symbol] = split[key]
+		numbers = {}
+		for symbol, old in enumerate(classes):
+			classes[symbol] = numbers.setdefault(old, len(numbers))
+		return classes
 
 	def __arcsets( self, arcs ):
-		self.__remove_other_arcs(arcs)
 		arcsets = {}
 		def add_arc_to_arcset(source, label, dest, weight):
 			if (source, dest, weight) not in arcsets:
@@ -156,14 +329,36 @@ class WeightedFSA(object):
 		return ret
 
 	def intersect(self, wfsa ):
+		#Only pairs of states reachable from the pair of start states are
+		#built. Each pair is numbered in the order it is found and known by the
+		#key number1*len(wfsa's states) + number2 until the new machine is done.
+		base = len(wfsa.__states)
+		keys = [0]
+		numbers = {keys[0]: 0}
+		def number(dest1, dest2):
+			key = dest1*base + dest2
+			if key not in numbers:
+				numbers[key] = len(keys)
+				keys.append(key)
+			return numbers[key]
+
+		#machines sharing a SymbolTable agree on every symbol number;
+		#otherwise wfsa's numbers are looked up once per symbol here
+		labels = None
+		if wfsa.symbols is not self.symbols:
+			labels = dict([(self.symbols[x], wfsa.symbols.get(x))
+					for x in self.alphabet])
+
 		states = []
-		
-		for state1 in self.__states.values():
-			for state2 in wfsa.__states.values():
-				states.append( state1.combine(state2) )
-		
-		start = self.start[0]+'%'+wfsa.start[0]
-		start_weight = self.start[1]*wfsa.start[1]
+		while len(states) < len(keys):
+			state1, state2 = divmod(keys[len(states)], base)
+			states.append( self.__states[state1].combine(
+					wfsa.__states[state2], len(states), number, labels) )
+		numbers = None
+		instrument.count('intersect.pairs', len(states))
+
+		start = 0
+		start_weight = self._start_weight*wfsa._start_weight
 		
 		import param_wfsa
 		if isinstance(self, MultWFSA):
@@ -176,60 +371,111 @@ class WeightedFSA(object):
 			new_wfsa = LogWFSA( self.alphabet, start, None, None, precision=False, 
 				states=states )
 		else:
-			new_wfsa = WeightedFSA( states, start, self.semiring, start_weight,
-				precision=False, states=states )
+			new_wfsa = WeightedFSA( self.alphabet, start, self.semiring,
+				start_weight, precision=False, states=states )
 		new_wfsa.complexity = self.complexity + wfsa.complexity
+		new_wfsa.symbols = self.symbols
+		new_wfsa._labels = self._labels
+		if new_wfsa._names is not None:
+			keys = [keys[x] for x in new_wfsa._names]
+		new_wfsa._names = None
+		new_wfsa._pair_keys = array('l', keys)
+		new_wfsa._pair_base = base
+		new_wfsa._pair_namings = (self._naming(), wfsa._naming())
 		return new_wfsa
+
+	def intersect_estimate(self, wfsa):
+		'''
+		Upper bounds on the size of self.intersect(wfsa), worked out from the
+		two machines without building it: a dict with the number of states,
+		the number of explicit arcs and the bytes those take. A product state
+		has an explicit arc on a letter both components read where at least one
+		of them has an explicit arc for it, and the estimate assumes no two
+		product states share a row and every arc weight is its own object, as
+		memory_report would count them.
+		'''
+		shared = len(self.alphabet.intersection(wfsa.alphabet))
+		def widest(machine):
+			states = machine.__states
+			return max([len(x._letters) for x in states]), \
+				any([x.default() is not None for x in states])
+		arcs1, default1 = widest(self)
+		arcs2, default2 = widest(wfsa)
+		per_state = min(arcs1, arcs2)
+		if default1:
+			per_state += arcs2
+		if default2:
+			per_state += arcs1
+		per_state = min(per_state, shared)
+		states = len(self.__states)*len(wfsa.__states)
+
+		sample = self.__states[0]
+		weight = self._start_weight
+		weight_bytes = getsizeof(weight) + getsizeof(weight.__dict__) + \
+				getsizeof(float(weight))
+		#a State, its three rows, a stop weight, a list slot and a pair key
+		state_bytes = getsizeof(sample) + 3*getsizeof(()) + weight_bytes + 16
+		#a slot in each row, an int dest and a weight
+		arc_bytes = 3*8 + getsizeof(0) + weight_bytes
+		return {'states':states, 'arcs':states*per_state,
+			'bytes':states*state_bytes + states*per_state*arc_bytes}
 	
 	def trim(self):
-		reachable = set([self.start[0]])
-		
-		next = set([])
-		for letter in self.alphabet:
-			next_state, weight = self.__states[self.start[0]].transition(letter)
-			if next_state is not None and weight!= self.semiring.zero:
-				next.add(next_state)
-		
-		while not next.issubset(reachable):
-			reachable = reachable.union(next)
-			next = set([])
-			for state in reachable:
-				for letter in self.alphabet:
-					next_state, weight = self.__states[state].transition(letter)
-					if next_state is not None and weight!= self.semiring.zero:
-						next.add(next_state)
-		
-		end_reachable = set([x.name for x in self.__states.values() 
-				if x.stop() != self.semiring.zero])
-		current = set(self.__states.keys())
-		next = current.difference(end_reachable)
-		
-		def can_reach_end( state ):
-			for letter in self.alphabet:
-				dest, weight = state.transition(letter)
-				if dest in end_reachable and weight is not None and \
-						weight != self.semiring.zero:
-					return True
-			return False
-				
-		while next != current and len(next) != 0:
-			current = next
-			next = set([])
-		
-			for name in current:
-				state = self.__states[name]
-				if can_reach_end(state):
-					end_reachable.add(name)
-				else:
-					next.add(name)
-			
-		#remove unreachable states and associated arcs
+		'''Removes the states that are not on a path from the start state to a
+		final state, along with their arcs, and renumbers the rest. The start
+		state is always kept.'''
+		zero = self.semiring.zero
+		successors = [[] for x in self.__states]
+		predecessors = [[] for x in self.__states]
+		for state in self.__states:
+			dests = [(dest, weight) for symbol, dest, weight in state.explicit_arcs()]
+			if state.default() is not None:
+				dests.append(state.default())
+			for dest, weight in dests:
+				if weight != zero:
+					successors[state.name].append(dest)
+					predecessors[dest].append(state.name)
+
+		def closure( start, neighbors ):
+			found = set(start)
+			frontier = list(start)
+			while frontier:
+				for next in neighbors[frontier.pop()]:
+					if next not in found:
+						found.add(next)
+						frontier.append(next)
+			return found
+
+		reachable = closure([0], successors)
+		end_reachable = closure([x.name for x in self.__states
+				if x.stop() != zero], predecessors)
 		reachable.intersection_update(end_reachable)
-		for name in self.state_names.difference(reachable):
-			self.__states.pop(name)
-			for state in reachable:
-				self.__states[state].prune_transitions(name)
-		self.state_names = frozenset(self.__states.keys())
+		reachable.add(0)
+		if len(reachable) == len(self.__states):
+			return
+
+		#remove unreachable states and associated arcs
+		kept = sorted(reachable)
+		removed = set(range(len(self.__states))).difference(reachable)
+		instrument.count('states_trimmed', len(removed))
+		index = dict([(old, new) for new, old in enumerate(kept)])
+		states = []
+		for name in kept:
+			state = self.__states[name]
+			state.prune_transitions(removed)
+			state.relabel(index)
+			states.append(state)
+		self.__states = states
+		self._usage = None
+
+		if self._pair_keys is not None:
+			self._pair_keys = array('l', [self._pair_keys[x] for x in kept])
+		elif self._names is not None:
+			self._names = [self._names[x] for x in kept]
+		else:
+			self._names = kept
+		self._name_index = None
+		self._invalidate_complexity()
 	
 	def all_pairs_shortest(self):
 		'''This is the Gen-All-Pairs algorithm from
@@ -238,23 +484,28 @@ class WeightedFSA(object):
 		the possible paths starting from the first state and ending in 
 		the second.
 		The results are used for fsa weight pushing.'''
+		d = self._all_pairs_shortest()
+		names = self.names()
+		return dict([(names[s1], dict([(names[s2], x) for s2, x in row.items()]))
+			for s1, row in d.items()])
 
+	def _all_pairs_shortest(self):
+		'''all_pairs_shortest with states given by number.'''
+		states = range(len(self.__states))
 		d = {} #d[s1][s2] is the shortest distance between states s1 and s2
-		for s1 in self.__states:
+		for s1 in states:
 			d[s1] = {}
-			for s2 in self.__states:
+			for s2 in states:
 				d[s1][s2] = self.semiring.zero
-				for letter in self.alphabet:
-					dest, weight = self.__states[s1].transition(letter)
-					if dest == s2:
-						d[s1][s2] += weight
-		for s0 in self.__states:
-			for s1 in self.__states:
+			for symbol, dest, weight in self.__states[s1].arcs():
+				d[s1][dest] += weight
+		for s0 in states:
+			for s1 in states:
 				if s1 == s0: continue
-				for s2 in self.__states:
+				for s2 in states:
 					if s2 == s0: continue
 					d[s1][s2] += d[s1][s0]*d[s0][s0].star*d[s0][s2]
-			for s1 in self.__states:
+			for s1 in states:
 				if s1 == s0: continue
 				d[s0][s1] = d[s0][s0].star*d[s0][s1]
 				d[s1][s0] = d[s1][s0]*d[s0][s0].star
@@ -262,68 +513,142 @@ class WeightedFSA(object):
 		return d
 	
 	def push_weight(self):		
-		distance = self.all_pairs_shortest()
+		distance = self._all_pairs_shortest()
 		finish = {}
 		for state0 in distance:
 			sum = self.semiring.zero
 			for state1 in distance[state0]:
-				sum += distance[state0][state1]*self.stop_weight(state1) 
+				sum += distance[state0][state1]*self.__states[state1].stop()
 			finish[state0] = sum
 		
-		transitions = {}
-		def new_weights( source, letter, dest, weight ):
-			new_weight = (self.semiring.one/finish[source])*weight*finish[dest]
-			if source not in transitions:
-				transitions[source] = {}
-			transitions[source][letter] = (dest, new_weight)
-		
-		for source, letter, dest, weight in self.all_transitions():
-			new_weights(source, letter, dest, weight)
-		
-		for state in transitions:
-			self.__states[state] = State(
-					state, self.alphabet, 
-					self.__states[state].stop()/finish[state],
-					transitions = transitions[state]
-				)
-		self.start = (self.start[0], self.start[1]*finish[self.start[0]])
+		#explicit and default arcs are reweighted where they are, so default
+		#arcs stay default arcs
+		for state in self.__states:
+			inverse = self.semiring.one/finish[state.name]
+			state.reweight(lambda dest, weight: inverse*weight*finish[dest],
+				state.stop()/finish[state.name])
+		self._share_rows()
+		self._start_weight = self._start_weight*finish[0]
+		self._invalidate_complexity()
 	
 	def weight(self, word, bound_strip = True):
-		if word[0]=='#' and word[-1]=='#' and bound_strip:
+		if bound_strip and len(word) > 1 and word[0]=='#' and word[-1]=='#':
 			word = word[1:-1]
-		name, weight = self.start
-		path = [name]
-		for letter in word:
+		name, weight = 0, self._start_weight
+		for letter in self.symbols.encode(word):
 			state = self.__states[name]
 			name, w =  state.transition(letter)
 			if name is None:
-				print word
-				print path
+				instrument.count('weight.rejected')
 				return self.semiring.zero
 			weight *= w
-			path.append(name)
 		weight *= self.__states[name].stop()
 		return weight
 	
+	def compile(self, symbols=None, partition=False):
+		'''Returns a CompiledWFSA with the same weights as this machine. See
+		compiled_wfsa.CompiledWFSA.'''
+		import compiled_wfsa
+		return compiled_wfsa.CompiledWFSA(self, symbols, partition)
+
+	def usage_counts(self, corpus, bound_strip=True):
+		'''How often the words of corpus use each arc and stop of the machine,
+		as CompiledWFSA.usage_counts counts them for self.compile(). The counts
+		only depend on which arcs there are, not on their weights, so those for
+		the latest corpus are kept until trimming changes the states.'''
+		corpus = tuple(corpus)
+		if self._usage is None or self._usage[:2] != (corpus, bound_strip):
+			compiled = self.compile()
+			counts = compiled.usage_counts(
+				compiled.encode_batch(corpus, bound_strip))
+			self._usage = (corpus, bound_strip, counts)
+		return self._usage[2]
+
+	def memory_report(self):
+		'''
+		The bytes held by this machine, by what holds them: a dict with
+			states: the State objects and the list of them
+			transitions: the rows of letters, destinations and weights and the
+				default arcs, each shared row counted once
+			semiring: the weight objects, each counted once however many arcs
+				share it
+			names: the state names and the tables between names and numbers
+			alphabet: the alphabet and label sets
+			parameters: parameter ties and values, for parametrized machines
+			total: the sum of the others
+		Objects shared with other machines, such as interned rows or the
+		alphabet of machines built from this one, are counted here too.
+		'''
+		seen = set([])
+		states = self.__states
+		report = {}
+		report['states'] = _bytes([states], seen) + _bytes(states, seen)
+		report['transitions'] = _bytes([row for x in states
+			for row in (x._letters, x._dests, x._weights)], seen) + \
+			_bytes([x.default() for x in states if x.default() is not None], seen)
+
+		weights = [self._start_weight] + [x.stop() for x in states] + \
+			[w for x in states for w in x._weights] + \
+			[x.default()[1] for x in states if x.default() is not None]
+		report['semiring'] = _bytes(weights, seen) + \
+			_bytes([w.__dict__ for w in weights], seen) + \
+			_bytes([w._value for w in weights], seen)
+
+		names = []
+		if self._names is not None:
+			names.append(self._names)
+			names.extend(self._names)
+		if self._pair_keys is not None:
+			names.append(self._pair_keys)
+		if self._name_index is not None:
+			names.append(self._name_index)
+		report['names'] = _bytes(names, seen)
+		report['alphabet'] = _bytes([self.alphabet, self._labels] +
+			[x._alphabet for x in states], seen)
+		report['parameters'] = self._parameter_bytes(seen)
+		report['total'] = sum(report.values())
+		return report
+
+	def _parameter_bytes(self, seen):
+		'''The bytes of the parameter ties of the states not in seen.'''
+		maps = [x._parameter_map for x in self.__states
+			if getattr(x, '_parameter_map', None) is not None]
+		return _bytes(maps, seen) + _bytes([y for x in maps
+			for y in x.itervalues()], seen)
+
 	def print_model(self):
 		print self.alphabet
 		print self.state_names
 		print self.start
-		for state in self.__states.values():
-			print state.name, state.stop()
+		for name in self.names():
+			print name, self.stop_weight(name)
 			for letter in self.alphabet:
-				print state.name, letter, '->', self.transition(state.name, letter)
+				print name, letter, '->', self.transition(name, letter)
 	
-	def _complexity(self):
+	def _complexity_terms(self):
+		'''The pair (a, b) such that the description length with weights
+		weight_len bits long is a + b*weight_len, or None if the complexity
+		can't be computed. The length is linear in weight_len, so two
+		evaluations give it.'''
+		fixed = self._complexity(0)
+		if fixed is None:
+			return None
+		return fixed, self._complexity(1) - fixed
+
+	def _complexity(self, weight_len=None):
+		'''The description length, with weights weight_len bits long if given
+		instead of self.weight_len.'''
+		if weight_len is None:
+			weight_len = self.weight_len
 		num_states = len(self.__states)
 		try:
-			num_arcs = sum(map(lambda s:s.num_arcs(), self.__states.values()))
+			num_arcs = sum(map(lambda s:s.num_arcs(), self.__states))
 		except TypeError:
 			return None
 		complexity = integer_code_len(num_states) + integer_code_len(num_arcs)
 		weight_encoding = \
-			lambda x: 1 if float(x) == 0.0 and self.zero else self.weight_len
-		for state in self.__states.values():
+			lambda x: 1 if float(x) == 0.0 and self.zero else weight_len
+		for state in self.__states:
 			complexity += state.complexity(num_states, weight_encoding)
 		return complexity
 	
@@ -351,7 +676,7 @@ class MultWFSA( WeightedFSA ):
 		#a probability for a word from the weights the machine assigns to
 		#that word.
 		
-		states = {self.start[0]: Probability.one} 	#maps states to the weight of all
+		states = {0: Probability.one} 	#maps states to the weight of all
 										#path that ends on that state at that
 										#iteration
 		
@@ -363,8 +688,9 @@ class MultWFSA( WeightedFSA ):
 			stop_updated = False
 			
 			for name in states:
-				if self.stop_weight(name) != Probability.zero:
-					next_stop += states[name]*self.stop_weight(name)
+				stop_weight = self._states()[name].stop()
+				if stop_weight != Probability.zero:
+					next_stop += states[name]*stop_weight
 					stop_updated = True
 				
 			def update_next_state_weights(source, letter, dest, weight):
@@ -374,22 +700,49 @@ class MultWFSA( WeightedFSA ):
 					else:
 						next[dest] += states[source]*weight
 			
-			for source, letter, dest, weight in self.all_transitions():
+			for source, letter, dest, weight in self._arcs():
 				update_next_state_weights(source, letter, dest, weight)
 			
 			if stop_updated:
 				if float(next_stop) < delta:
+					instrument.count('norm_constant.iterations', i + 1)
+					instrument.latest('norm_constant.residual', float(next_stop))
 					return float(stop + next_stop), True
 			states = next
 			stop += next_stop
-		print max_iterations, 'iterations reached without convergence'
-		return float(states[end_state]), False
-	
+		#the weight stopped so far is the best estimate there is
+		instrument.count('norm_constant.iterations', max_iterations)
+		instrument.latest('norm_constant.residual', float(next_stop))
+		return float(stop), False
+
+	def sample( self, n, rng=None ):
+		'''Draws n random words from the distribution this machine defines,
+		normalized by the machine's total weight. See CompiledWFSA.sample.'''
+		return self.compile().sample(n, rng)
+
+	def entropy( self ):
+		'''The entropy in bits of the distribution this machine defines,
+		normalized by its total weight. See CompiledWFSA.entropy.'''
+		return self.compile().entropy()
+
+	def cross_entropy( self, reference ):
+		'''The expected cost in bits under the normalized reference machine of
+		a word drawn from this machine's distribution. See
+		CompiledWFSA.cross_entropy.'''
+		return self.compile().cross_entropy(reference)
+
+	def expected_length( self ):
+		'''The expected length of a word drawn from this machine's
+		distribution.'''
+		return self.compile().expected_length()
+
 	def log_wfsa(self, base=2):
 		states = []
-		for state in self.__states.values():
+		for state in self._states():
 			states.append(state.change_semiring(lambda x:x.to_tropical(base)))
-		ret = LogWFSA( self.alphabet, self.start[0], None, None, states=states )
+		ret = LogWFSA( self.alphabet, 0, None, None, states=states )
+		ret._share_names(self)
+		ret.symbols = self.symbols
 		ret.complexity = self.complexity
 		return ret
 	
@@ -399,26 +752,27 @@ class LogWFSA( WeightedFSA ):
 			m=None, e=None, zero = False, states=None ):
 		if states is None:
 			WeightedFSA.__init__(self, alphabet, start, Tropical, 0.0, stops, arcs, 
-				precision, m, e, zero)
+				precision=precision, m=m, e=e, zero=zero)
 		else:
 			WeightedFSA.__init__(self, alphabet, start, Tropical, 0.0,
 				precision=precision, m=m, e=e, zero=zero, states=states)
 	
+	def best_path( self ):
+		'''The lowest cost word and its cost. See CompiledWFSA.best_path.'''
+		return self.compile().best_path()
+
+	def k_best( self, k ):
+		'''The k lowest cost words with their costs, cheapest first. See
+		CompiledWFSA.k_best.'''
+		return self.compile().k_best(k)
+
 	def mult_wfsa( self, base=2 ):
 		states = []
-		for state in self.__states.values():
+		for state in self._states():
 			states.append(state.change_semiring(lambda x:x.to_probability(base)))
-		ret = LogWFSA( self.alphabet, self.start[0], None, None, states=states )
+		ret = MultWFSA( self.alphabet, 0, None, None, states=states )
+		ret._share_names(self)
+		ret.symbols = self.symbols
 		ret.complexity = self.complexity
 		return ret
 	
-
-class WFSAOverflowError(Exception):
-	def __init__( mantissa, exp, number ):
-		self.mantissa = mantissa
-		self.exp = exp
-		self.number = number
-	
-	def __str__(self):
-		return str(self.exp)+' bit exponent is too small to represent '\
-			+str(self.number)+'.'